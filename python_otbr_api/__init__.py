@@ -2,11 +2,16 @@
 
 from __future__ import annotations
 
+import asyncio
+import contextlib
 from enum import Enum
 from http import HTTPStatus
+from os import PathLike
 from typing import Any
 import json
 import logging
+import os
+import tempfile
 
 import aiohttp
 import voluptuous as vol  # type: ignore[import]
@@ -17,6 +22,9 @@ from .models import ActiveDataSet, PendingDataSet, Timestamp
 # https://github.com/openthread/openthread/discussions/8567#discussioncomment-4468920
 PENDING_DATASET_DELAY_TIMER = 5 * 60 * 1000
 
+# Timeout of requests which don't use the configurable timeout
+_FIXED_TIMEOUT = aiohttp.ClientTimeout(total=10)
+
 _LOGGER = logging.getLogger(__name__)
 
 # OTBR flipped the REST API from PascalCase to camelCase in ot-br-posix
@@ -72,6 +80,102 @@ class KeyFormat(Enum):
     PASCAL_CASE = "pascal"
 
 
+class KeyFormatCache:
+    """Cache of detected JSON key formats, keyed by OTBR base URL.
+
+    Share an instance between OTBR objects so detection runs once per router. If a
+    path is passed, the cache is also stored as JSON in that file so it survives
+    restarts. OTBR objects read the file on first use and write it when a format
+    changes, both in the executor; load() and save() do the same synchronously,
+    e.g. to load the cache during setup, outside the event loop.
+    """
+
+    def __init__(self, path: str | PathLike[str] | None = None) -> None:
+        """Initialize."""
+        self._path = path
+        self._formats: dict[str, KeyFormat] = {}
+        self._loaded = path is None
+        self._save_lock = asyncio.Lock()
+
+    def load(self) -> None:
+        """Load the cached formats from disk, formats set before take precedence."""
+        self._loaded = True
+        if self._path is None:
+            return
+        try:
+            with open(self._path, encoding="utf-8") as file:
+                stored = json.load(file)
+            formats = {url: KeyFormat(value) for url, value in stored.items()}
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError, AttributeError) as err:
+            _LOGGER.warning("Ignoring invalid key format cache %s: %s", self._path, err)
+            return
+        self._formats = formats | self._formats
+
+    async def async_load(self) -> None:
+        """Load the cached formats from disk in the executor, unless loaded."""
+        if not self._loaded:
+            await asyncio.get_running_loop().run_in_executor(None, self.load)
+
+    def save(self) -> None:
+        """Store the cached formats on disk."""
+        self._write(self._serialize())
+
+    async def async_save(self) -> None:
+        """Store the cached formats on disk in the executor."""
+        if self._path is None:
+            return
+        # Saves run one at a time and serialize when they start, so an older
+        # state can't overwrite a newer one
+        async with self._save_lock:
+            stored = self._serialize()
+            await asyncio.get_running_loop().run_in_executor(None, self._write, stored)
+
+    def _serialize(self) -> dict[str, str]:
+        """Return the cached formats as stored on disk."""
+        return {url: key_format.value for url, key_format in self._formats.items()}
+
+    def _write(self, stored: dict[str, str]) -> None:
+        """Replace the file atomically, so readers never see a partial write."""
+        if self._path is None:
+            return
+        path = os.fspath(self._path)
+        try:
+            fd, tmp_path = tempfile.mkstemp(
+                dir=os.path.dirname(path) or None, prefix=".key_formats."
+            )
+        except OSError as err:
+            _LOGGER.warning("Could not store key format cache %s: %s", path, err)
+            return
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as file:
+                json.dump(stored, file)
+            os.replace(tmp_path, path)
+        except OSError as err:
+            _LOGGER.warning("Could not store key format cache %s: %s", path, err)
+            with contextlib.suppress(OSError):
+                os.unlink(tmp_path)
+
+    def get(self, url: str) -> KeyFormat | None:
+        """Return the cached key format of an OTBR."""
+        return self._formats.get(url)
+
+    def set(self, url: str, key_format: KeyFormat) -> bool:
+        """Store the key format of an OTBR, return whether it changed."""
+        if self._formats.get(url) == key_format:
+            return False
+        self._formats[url] = key_format
+        return True
+
+    def invalidate(self, url: str) -> bool:
+        """Forget the key format of an OTBR, e.g. after it was upgraded.
+
+        Returns whether a key format was forgotten.
+        """
+        return self._formats.pop(url, None) is not None
+
+
 class OTBRError(Exception):
     """Raised on error."""
 
@@ -88,14 +192,42 @@ class ThreadNetworkActiveError(OTBRError):
     """Raised on attempts to modify the active dataset when thread network is active."""
 
 
-def _rewrite_keys(data: Any, mapping: dict[str, str]) -> Any:
-    """Recursively rename dict keys according to mapping; pass through others."""
+def _infer_key_format(data: Any) -> KeyFormat | None:
+    """Infer the key format from the top level keys of a response body."""
     if not isinstance(data, dict):
-        return data
-    return {mapping.get(k, k): _rewrite_keys(v, mapping) for k, v in data.items()}
+        return None
+    key_format = None
+    for key in data:
+        if key in _CAMEL_TO_PASCAL:
+            return KeyFormat.CAMEL_CASE
+        if key in _PASCAL_TO_CAMEL:
+            key_format = KeyFormat.PASCAL_CASE
+    return key_format
 
 
-class OTBR:  # pylint: disable=too-few-public-methods
+def _rewrite_keys(data: Any, mapping: dict[str, str]) -> Any:
+    """Recursively rename dict keys according to mapping; pass through others.
+
+    Data without keys to rename is returned as is instead of being copied.
+    """
+    if not isinstance(data, dict):
+        return data
+    if not mapping.keys().isdisjoint(data):
+        return {mapping.get(k, k): _rewrite_keys(v, mapping) for k, v in data.items()}
+    # Only values change, copy on the first rewritten child
+    rewritten: dict | None = None
+    for key, value in data.items():
+        if (
+            isinstance(value, dict)
+            and (new_value := _rewrite_keys(value, mapping)) is not value
+        ):
+            if rewritten is None:
+                rewritten = dict(data)
+            rewritten[key] = new_value
+    return data if rewritten is None else rewritten
+
+
+class OTBR:  # pylint: disable=too-few-public-methods,too-many-instance-attributes
     """Class to interact with the Open Thread Border Router REST API."""
 
     def __init__(
@@ -105,22 +237,117 @@ class OTBR:  # pylint: disable=too-few-public-methods
         timeout: int = 10,
         *,
         key_format: KeyFormat | None = None,
+        key_format_cache: KeyFormatCache | None = None,
     ) -> None:
         """Initialize."""
         self._session = session
+        self._owns_session = False
         self._url = url
-        self._timeout = timeout
+        self._timeout = aiohttp.ClientTimeout(total=timeout)
         self._key_format = key_format
+        # A key format passed by the caller is used as is, it's never replaced
+        self._key_format_fixed = key_format is not None
+        self._key_format_cache = key_format_cache
+        self._detect_task: asyncio.Task[None] | None = None
+
+    @classmethod
+    def create(  # pylint: disable=too-many-arguments
+        cls,
+        url: str,
+        timeout: int = 10,
+        *,
+        key_format: KeyFormat | None = None,
+        key_format_cache: KeyFormatCache | None = None,
+        limit_per_host: int = 4,
+        keepalive_timeout: float = 60,
+        ttl_dns_cache: int = 300,
+    ) -> OTBR:
+        """Create an OTBR with its own session, tuned for talking to one router.
+
+        Connections are kept alive for keepalive_timeout seconds so polling reuses
+        them, at most limit_per_host connections are opened and DNS lookups are
+        cached for ttl_dns_cache seconds. The session is closed by close() or when
+        leaving an async with block. Must be called from the event loop.
+        """
+        connector = aiohttp.TCPConnector(
+            limit_per_host=limit_per_host,
+            keepalive_timeout=keepalive_timeout,
+            ttl_dns_cache=ttl_dns_cache,
+        )
+        otbr = cls(
+            url,
+            aiohttp.ClientSession(connector=connector),
+            timeout,
+            key_format=key_format,
+            key_format_cache=key_format_cache,
+        )
+        otbr._owns_session = True
+        return otbr
+
+    async def close(self) -> None:
+        """Close the session if it was created by create()."""
+        if self._owns_session:
+            await self._session.close()
+
+    async def __aenter__(self) -> OTBR:
+        """Enter the context."""
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        """Exit the context, closing the session if it was created by create()."""
+        await self.close()
+
+    async def _request(
+        self,
+        method: str,
+        path: str,
+        *,
+        timeout: aiohttp.ClientTimeout | None = None,
+        **kwargs: Any,
+    ) -> aiohttp.ClientResponse:
+        """Send a request to the OTBR REST API.
+
+        The body is read before returning and the connection is released, also if
+        the request fails, so the connection can be reused whatever the caller does
+        with the response.
+        """
+        async with self._session.request(
+            method,
+            f"{self._url}{path}",
+            timeout=self._timeout if timeout is None else timeout,
+            **kwargs,
+        ) as response:
+            await response.read()
+        return response
 
     async def _maybe_detect_key_format(self) -> None:
         """Probe the OTBR REST API to determine the JSON key format."""
         if self._key_format is not None:
             return
 
-        response = await self._session.get(
-            f"{self._url}/api/actions",
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
-        )
+        if self._key_format_cache is not None:
+            await self._key_format_cache.async_load()
+            if key_format := self._key_format_cache.get(self._url):
+                self._key_format = key_format
+                return
+
+        # Concurrent callers share a single probe, it's forgotten when done so a
+        # failed probe is retried by the next call
+        if self._detect_task is None:
+            self._detect_task = asyncio.create_task(self._detect_key_format())
+            self._detect_task.add_done_callback(self._detect_key_format_done)
+        await asyncio.shield(self._detect_task)
+
+    def _detect_key_format_done(self, task: asyncio.Task[None]) -> None:
+        """Forget the finished key format probe."""
+        self._detect_task = None
+        if not task.cancelled():
+            # Mark the exception retrieved, the callers may all have been cancelled
+            task.exception()
+
+    async def _detect_key_format(self) -> None:
+        """Probe the OTBR REST API to determine the JSON key format."""
+        response = await self._request("GET", "/api/actions")
 
         if response.status == HTTPStatus.OK:
             self._key_format = KeyFormat.CAMEL_CASE
@@ -133,6 +360,34 @@ class OTBR:  # pylint: disable=too-few-public-methods
             )
 
         _LOGGER.debug("Detected OTBR JSON key format: %s", self._key_format)
+        if self._key_format_cache is not None and self._key_format_cache.set(
+            self._url, self._key_format
+        ):
+            await self._key_format_cache.async_save()
+
+    async def _check_key_format(self, data: Any) -> None:
+        """Update the key format if a response shows the OTBR was upgraded."""
+        if self._key_format_fixed:
+            return
+        key_format = _infer_key_format(data)
+        if key_format is None or key_format == self._key_format:
+            return
+        _LOGGER.debug("OTBR JSON key format changed to: %s", key_format)
+        self._key_format = key_format
+        if self._key_format_cache is not None and self._key_format_cache.set(
+            self._url, key_format
+        ):
+            await self._key_format_cache.async_save()
+
+    async def _forget_key_format(self) -> None:
+        """Forget the key format, it's detected again on the next call."""
+        if self._key_format_fixed:
+            return
+        self._key_format = None
+        if self._key_format_cache is not None and self._key_format_cache.invalidate(
+            self._url
+        ):
+            await self._key_format_cache.async_save()
 
     def _encode(self, data: dict) -> dict:
         """Rewrite a camelCase body to the detected wire format."""
@@ -151,9 +406,10 @@ class OTBR:  # pylint: disable=too-few-public-methods
     async def factory_reset(self) -> None:
         """Factory reset the router."""
         await self._maybe_detect_key_format()
-        response = await self._session.delete(
-            f"{self._url}/node",
-            timeout=aiohttp.ClientTimeout(total=10),
+        response = await self._request(
+            "DELETE",
+            "/node",
+            timeout=_FIXED_TIMEOUT,
         )
 
         if response.status == HTTPStatus.METHOD_NOT_ALLOWED:
@@ -165,10 +421,7 @@ class OTBR:  # pylint: disable=too-few-public-methods
     async def get_border_agent_id(self) -> bytes:
         """Get the border agent ID."""
         await self._maybe_detect_key_format()
-        response = await self._session.get(
-            f"{self._url}/node/ba-id",
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
-        )
+        response = await self._request("GET", "/node/ba-id")
 
         if response.status == HTTPStatus.NOT_FOUND:
             raise GetBorderAgentIdNotSupportedError
@@ -184,10 +437,11 @@ class OTBR:  # pylint: disable=too-few-public-methods
     async def set_enabled(self, enabled: bool) -> None:
         """Enable or disable the router."""
         await self._maybe_detect_key_format()
-        response = await self._session.put(
-            f"{self._url}/node/state",
+        response = await self._request(
+            "PUT",
+            "/node/state",
             json="enable" if enabled else "disable",
-            timeout=aiohttp.ClientTimeout(total=10),
+            timeout=_FIXED_TIMEOUT,
         )
 
         if response.status != HTTPStatus.OK:
@@ -200,10 +454,7 @@ class OTBR:  # pylint: disable=too-few-public-methods
         Raises if the http status is 400 or higher or if the response is invalid.
         """
         await self._maybe_detect_key_format()
-        response = await self._session.get(
-            f"{self._url}/node/dataset/active",
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
-        )
+        response = await self._request("GET", "/node/dataset/active")
 
         if response.status == HTTPStatus.NO_CONTENT:
             return None
@@ -212,7 +463,9 @@ class OTBR:  # pylint: disable=too-few-public-methods
             raise OTBRError(f"unexpected http status {response.status}")
 
         try:
-            return ActiveDataSet.from_json(self._decode(await response.json()))
+            data = await response.json()
+            await self._check_key_format(data)
+            return ActiveDataSet.from_json(self._decode(data))
         except (json.JSONDecodeError, vol.Error) as exc:
             raise OTBRError("unexpected API response") from exc
 
@@ -223,10 +476,10 @@ class OTBR:  # pylint: disable=too-few-public-methods
         Raises if the http status is 400 or higher or if the response is invalid.
         """
         await self._maybe_detect_key_format()
-        response = await self._session.get(
-            f"{self._url}/node/dataset/active",
+        response = await self._request(
+            "GET",
+            "/node/dataset/active",
             headers={"Accept": "text/plain"},
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
         )
 
         if response.status == HTTPStatus.NO_CONTENT:
@@ -247,10 +500,10 @@ class OTBR:  # pylint: disable=too-few-public-methods
         Raises if the http status is 400 or higher or if the response is invalid.
         """
         await self._maybe_detect_key_format()
-        response = await self._session.get(
-            f"{self._url}/node/dataset/pending",
+        response = await self._request(
+            "GET",
+            "/node/dataset/pending",
             headers={"Accept": "text/plain"},
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
         )
 
         if response.status == HTTPStatus.NO_CONTENT:
@@ -272,24 +525,25 @@ class OTBR:  # pylint: disable=too-few-public-methods
         Raises if the http status is 400 or higher or if the response is invalid.
         """
         await self._maybe_detect_key_format()
-        response = await self._session.put(
-            f"{self._url}/node/dataset/active",
+        response = await self._request(
+            "PUT",
+            "/node/dataset/active",
             json=self._encode(dataset.as_json()),
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
         )
 
         if response.status == HTTPStatus.CONFLICT:
             raise ThreadNetworkActiveError
+        if response.status == HTTPStatus.BAD_REQUEST:
+            # The body may have been rejected because the OTBR was upgraded or
+            # downgraded and expects the other key format
+            await self._forget_key_format()
         if response.status not in (HTTPStatus.CREATED, HTTPStatus.OK):
             raise OTBRError(f"unexpected http status {response.status}")
 
     async def delete_active_dataset(self) -> None:
         """Delete active operational dataset."""
         await self._maybe_detect_key_format()
-        response = await self._session.delete(
-            f"{self._url}/node/dataset/active",
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
-        )
+        response = await self._request("DELETE", "/node/dataset/active")
 
         if response.status == HTTPStatus.CONFLICT:
             raise ThreadNetworkActiveError
@@ -304,24 +558,25 @@ class OTBR:  # pylint: disable=too-few-public-methods
         Raises if the http status is 400 or higher or if the response is invalid.
         """
         await self._maybe_detect_key_format()
-        response = await self._session.put(
-            f"{self._url}/node/dataset/pending",
+        response = await self._request(
+            "PUT",
+            "/node/dataset/pending",
             json=self._encode(dataset.as_json()),
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
         )
 
         if response.status == HTTPStatus.CONFLICT:
             raise ThreadNetworkActiveError
+        if response.status == HTTPStatus.BAD_REQUEST:
+            # The body may have been rejected because the OTBR was upgraded or
+            # downgraded and expects the other key format
+            await self._forget_key_format()
         if response.status not in (HTTPStatus.CREATED, HTTPStatus.OK):
             raise OTBRError(f"unexpected http status {response.status}")
 
     async def delete_pending_dataset(self) -> None:
         """Delete pending operational dataset."""
         await self._maybe_detect_key_format()
-        response = await self._session.delete(
-            f"{self._url}/node/dataset/pending",
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
-        )
+        response = await self._request("DELETE", "/node/dataset/pending")
 
         if response.status == HTTPStatus.CONFLICT:
             raise ThreadNetworkActiveError
@@ -334,11 +589,12 @@ class OTBR:  # pylint: disable=too-few-public-methods
         Raises if the http status is 400 or higher or if the response is invalid.
         """
         await self._maybe_detect_key_format()
-        response = await self._session.put(
-            f"{self._url}/node/dataset/active",
+        response = await self._request(
+            "PUT",
+            "/node/dataset/active",
             data=dataset.hex(),
             headers={"Content-Type": "text/plain"},
-            timeout=aiohttp.ClientTimeout(total=10),
+            timeout=_FIXED_TIMEOUT,
         )
 
         if response.status == HTTPStatus.CONFLICT:
@@ -374,10 +630,10 @@ class OTBR:  # pylint: disable=too-few-public-methods
         Raises if the http status is not 200 or if the response is invalid.
         """
         await self._maybe_detect_key_format()
-        response = await self._session.get(
-            f"{self._url}/node/ext-address",
+        response = await self._request(
+            "GET",
+            "/node/ext-address",
             headers={"Accept": "application/json"},
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
         )
 
         if response.status != HTTPStatus.OK:
@@ -394,10 +650,10 @@ class OTBR:  # pylint: disable=too-few-public-methods
         Raises if the http status is not 200 or if the response is invalid.
         """
         await self._maybe_detect_key_format()
-        response = await self._session.get(
-            f"{self._url}/node/coprocessor/version",
+        response = await self._request(
+            "GET",
+            "/node/coprocessor/version",
             headers={"Accept": "application/json"},
-            timeout=aiohttp.ClientTimeout(total=self._timeout),
         )
 
         if response.status != HTTPStatus.OK:
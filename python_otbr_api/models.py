@@ -2,13 +2,54 @@
 
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Any
+from collections.abc import Mapping
+from dataclasses import dataclass, fields, is_dataclass, replace
+import hashlib
+import ipaddress
+from typing import Any, TypeVar, overload
+import weakref
 
 import voluptuous as vol  # type: ignore[import]
 
+from . import tlv_parser
+from .tlv_parser import MeshcopTLVItem, MeshcopTLVType
 
-@dataclass
+_ItemT = TypeVar("_ItemT", bound=MeshcopTLVItem)
+
+
+def _schema_types(schema: vol.Schema) -> dict[str, type]:
+    """Return the value types of a schema of optional keys."""
+    return {key.schema: value for key, value in schema.schema.items()}
+
+
+def _content_hash(model: Any) -> bytes:
+    """Return a stable hash of the content of a model.
+
+    The generated dataclass repr lists every field, nested models included, and
+    only contains str, int, bool and None values, so it doesn't vary between
+    processes.
+    """
+    return hashlib.blake2b(repr(model).encode(), digest_size=16).digest()
+
+
+def _validate(schema: vol.Schema, types: dict[str, type], json_data: Any) -> None:
+    """Validate JSON data against a schema of optional keys.
+
+    Valid data is checked against the value types directly, the schema is only run
+    to raise the same error as it would.
+    """
+    if isinstance(json_data, dict):
+        for key, value in json_data.items():
+            if (value_type := types.get(key)) is None or not isinstance(
+                value, value_type
+            ):
+                break
+        else:
+            return
+    schema(json_data)
+
+
+@dataclass(slots=True)
 class Timestamp:
     """Timestamp."""
 
@@ -19,11 +60,16 @@ class Timestamp:
             vol.Optional("ticks"): int,
         }
     )
+    _SCHEMA_TYPES = _schema_types(SCHEMA)
 
     authoritative: bool | None = None
     seconds: int | None = None
     ticks: int | None = None
 
+    def replace(self, **changes: Any) -> Timestamp:
+        """Return a copy with the given fields replaced."""
+        return replace(self, **changes)
+
     def as_json(self) -> dict:
         """Serialize to JSON."""
         result: dict[str, Any] = {}
@@ -38,7 +84,7 @@ class Timestamp:
     @classmethod
     def from_json(cls, json_data: Any) -> Timestamp:
         """Deserialize from JSON."""
-        cls.SCHEMA(json_data)
+        _validate(cls.SCHEMA, cls._SCHEMA_TYPES, json_data)
         return cls(
             json_data.get("authoritative"),
             json_data.get("seconds"),
@@ -46,7 +92,7 @@ class Timestamp:
         )
 
 
-@dataclass
+@dataclass(slots=True)
 class SecurityPolicy:  # pylint: disable=too-many-instance-attributes
     """Security policy."""
 
@@ -64,6 +110,7 @@ class SecurityPolicy:  # pylint: disable=too-many-instance-attributes
             vol.Optional("tobleLink"): bool,
         }
     )
+    _SCHEMA_TYPES = _schema_types(SCHEMA)
 
     autonomous_enrollment: bool | None = None
     commercial_commissioning: bool | None = None
@@ -76,6 +123,10 @@ class SecurityPolicy:  # pylint: disable=too-many-instance-attributes
     routers: bool | None = None
     to_ble_link: bool | None = None
 
+    def replace(self, **changes: Any) -> SecurityPolicy:
+        """Return a copy with the given fields replaced."""
+        return replace(self, **changes)
+
     def as_json(self) -> dict:
         """Serialize to JSON."""
         result: dict[str, Any] = {}
@@ -104,7 +155,7 @@ class SecurityPolicy:  # pylint: disable=too-many-instance-attributes
     @classmethod
     def from_json(cls, json_data: Any) -> SecurityPolicy:
         """Deserialize from JSON."""
-        cls.SCHEMA(json_data)
+        _validate(cls.SCHEMA, cls._SCHEMA_TYPES, json_data)
         return cls(
             json_data.get("autonomousEnrollment"),
             json_data.get("commercialCommissioning"),
@@ -119,7 +170,7 @@ class SecurityPolicy:  # pylint: disable=too-many-instance-attributes
         )
 
 
-@dataclass
+@dataclass(slots=True, weakref_slot=True)
 class ActiveDataSet:  # pylint: disable=too-many-instance-attributes
     """Operational dataset."""
 
@@ -137,6 +188,7 @@ class ActiveDataSet:  # pylint: disable=too-many-instance-attributes
             vol.Optional("securityPolicy"): dict,
         }
     )
+    _SCHEMA_TYPES = _schema_types(SCHEMA)
 
     active_timestamp: Timestamp | None = None
     channel_mask: int | None = None
@@ -149,6 +201,17 @@ class ActiveDataSet:  # pylint: disable=too-many-instance-attributes
     psk_c: str | None = None
     security_policy: SecurityPolicy | None = None
 
+    def replace(self, **changes: Any) -> ActiveDataSet:
+        """Return a copy with the given fields replaced."""
+        return replace(self, **changes)
+
+    def content_hash(self) -> bytes:
+        """Return a stable hash of the dataset's content.
+
+        Equal datasets hash the same, also in other processes.
+        """
+        return _content_hash(self)
+
     def as_json(self) -> dict:
         """Serialize to JSON."""
         result: dict[str, Any] = {}
@@ -177,7 +240,7 @@ class ActiveDataSet:  # pylint: disable=too-many-instance-attributes
     @classmethod
     def from_json(cls, json_data: Any) -> ActiveDataSet:
         """Deserialize from JSON."""
-        cls.SCHEMA(json_data)
+        _validate(cls.SCHEMA, cls._SCHEMA_TYPES, json_data)
         active_timestamp = None
         security_policy = None
         if "activeTimestamp" in json_data:
@@ -198,8 +261,23 @@ class ActiveDataSet:  # pylint: disable=too-many-instance-attributes
             security_policy,
         )
 
+    @classmethod
+    def from_tlv(cls, data: bytes) -> ActiveDataSet:
+        """Deserialize from TLV.
+
+        Raises if the TLV is invalid.
+        """
+        return _active_dataset_from_tlv(cls(), tlv_parser.parse_tlv_bytes(data))
+
+    def to_tlv(self) -> bytes:
+        """Serialize to TLV.
 
-@dataclass
+        Raises ValueError if a field can't be encoded.
+        """
+        return _encode_tlv(_active_dataset_to_tlv(self))
+
+
+@dataclass(slots=True, weakref_slot=True)
 class PendingDataSet:  # pylint: disable=too-many-instance-attributes
     """Operational dataset."""
 
@@ -210,11 +288,23 @@ class PendingDataSet:  # pylint: disable=too-many-instance-attributes
             vol.Optional("pendingTimestamp"): dict,
         }
     )
+    _SCHEMA_TYPES = _schema_types(SCHEMA)
 
     active_dataset: ActiveDataSet | None = None
     delay: int | None = None
     pending_timestamp: Timestamp | None = None
 
+    def replace(self, **changes: Any) -> PendingDataSet:
+        """Return a copy with the given fields replaced."""
+        return replace(self, **changes)
+
+    def content_hash(self) -> bytes:
+        """Return a stable hash of the dataset's content.
+
+        Equal datasets hash the same, also in other processes.
+        """
+        return _content_hash(self)
+
     def as_json(self) -> dict:
         """Serialize to JSON."""
         result: dict[str, Any] = {}
@@ -229,7 +319,7 @@ class PendingDataSet:  # pylint: disable=too-many-instance-attributes
     @classmethod
     def from_json(cls, json_data: Any) -> PendingDataSet:
         """Deserialize from JSON."""
-        cls.SCHEMA(json_data)
+        _validate(cls.SCHEMA, cls._SCHEMA_TYPES, json_data)
         active_dataset = None
         pending_timestamp = None
         if "activeDataset" in json_data:
@@ -242,3 +332,338 @@ class PendingDataSet:  # pylint: disable=too-many-instance-attributes
             json_data.get("delay"),
             pending_timestamp,
         )
+
+    @classmethod
+    def from_tlv(cls, data: bytes) -> PendingDataSet:
+        """Deserialize from TLV.
+
+        Raises if the TLV is invalid.
+        """
+        items = tlv_parser.parse_tlv_bytes(data)
+        dataset = cls(_active_dataset_from_tlv(ActiveDataSet(), items))
+        if item := items.get(MeshcopTLVType.DELAYTIMER):
+            dataset.delay = _decode_item(item, tlv_parser.Integer).value
+        if item := items.get(MeshcopTLVType.PENDINGTIMESTAMP):
+            dataset.pending_timestamp = _timestamp_from_tlv(item)
+        return dataset
+
+    def to_tlv(self) -> bytes:
+        """Serialize to TLV.
+
+        Raises ValueError if a field can't be encoded.
+        """
+        items: dict[MeshcopTLVType | int, MeshcopTLVItem] = {}
+        if self.active_dataset is not None:
+            items.update(_active_dataset_to_tlv(self.active_dataset))
+        if self.pending_timestamp is not None:
+            items[MeshcopTLVType.PENDINGTIMESTAMP] = MeshcopTLVItem(
+                MeshcopTLVType.PENDINGTIMESTAMP,
+                _timestamp_to_tlv(self.pending_timestamp),
+            )
+        if self.delay is not None:
+            items[MeshcopTLVType.DELAYTIMER] = MeshcopTLVItem(
+                MeshcopTLVType.DELAYTIMER, _int_to_bytes(self.delay, 4, "delay")
+            )
+        return _encode_tlv(items)
+
+
+def _decode_item(item: MeshcopTLVItem, decoder: type[_ItemT]) -> _ItemT:
+    """Return the item decoded by decoder.
+
+    The item is decoded again if another decoder was registered for its tag.
+    Raises if the item is invalid.
+    """
+    if isinstance(item, decoder):
+        return item
+    return decoder(item.tag, item.data)
+
+
+def _int_to_bytes(value: int, length: int, name: str) -> bytes:
+    """Encode an unsigned big endian integer.
+
+    Raises ValueError if the value doesn't fit in length bytes.
+    """
+    try:
+        return value.to_bytes(length, "big")
+    except OverflowError as err:
+        raise ValueError(f"invalid {name} {value}") from err
+
+
+def _encode_tlv(items: dict[MeshcopTLVType | int, MeshcopTLVItem]) -> bytes:
+    """Encode TLV items, raising ValueError if they can't be encoded."""
+    try:
+        return tlv_parser.encode_tlv_bytes(items)
+    except tlv_parser.TLVError as err:
+        raise ValueError(str(err)) from err
+
+
+def _timestamp_from_tlv(item: MeshcopTLVItem) -> Timestamp:
+    """Create a timestamp from a TLV timestamp item."""
+    item = _decode_item(item, tlv_parser.Timestamp)
+    return Timestamp(item.authoritative, item.seconds, item.ticks)
+
+
+def _channel_from_tlv(item: MeshcopTLVItem) -> int:
+    """Return the channel of a TLV channel item.
+
+    Only channel page 0 is supported, the model has no field for the page.
+    """
+    if len(item.data) != 3:
+        raise tlv_parser.TLVError(f"invalid channel '{item.data.hex()}'")
+    if page := item.data[0]:
+        raise tlv_parser.TLVError(f"unsupported channel page {page}")
+    return _decode_item(item, tlv_parser.Channel).channel
+
+
+def _timestamp_to_tlv(timestamp: Timestamp) -> bytes:
+    """Encode a timestamp to the value of a TLV timestamp item."""
+    ticks = (timestamp.ticks or 0) << 1
+    if timestamp.authoritative:
+        ticks |= 1
+    return _int_to_bytes(
+        timestamp.seconds or 0, 6, "timestamp seconds"
+    ) + _int_to_bytes(ticks, 2, "timestamp ticks")
+
+
+def _security_policy_from_tlv(item: MeshcopTLVItem) -> SecurityPolicy:
+    """Create a security policy from a TLV security policy item."""
+    item = _decode_item(item, tlv_parser.SecurityPolicy)
+    return SecurityPolicy(
+        item.autonomous_enrollment,
+        item.commercial_commissioning,
+        item.external_commissioning,
+        item.native_commissioning,
+        item.network_key_provisioning,
+        item.non_ccm_routers,
+        item.obtain_network_key,
+        item.rotation_time,
+        item.routers,
+        item.to_ble_link,
+    )
+
+
+def _security_policy_to_tlv(policy: SecurityPolicy) -> bytes:
+    """Encode a security policy to the value of a TLV security policy item.
+
+    Flags which are not set get the Thread default, some of the flags are set when
+    the feature is disabled.
+    """
+    flags = 0
+    if policy.obtain_network_key is not False:
+        flags |= 0x80
+    if policy.native_commissioning is not False:
+        flags |= 0x40
+    if policy.routers is not False:
+        flags |= 0x20
+    if policy.external_commissioning is not False:
+        flags |= 0x10
+    if not policy.commercial_commissioning:
+        flags |= 0x04
+    if not policy.autonomous_enrollment:
+        flags |= 0x02
+    if not policy.network_key_provisioning:
+        flags |= 0x01
+    # The reserved bits of the second flags byte are set
+    flags = flags << 8 | 0x38
+    if policy.to_ble_link is not False:
+        flags |= 0x80
+    if not policy.non_ccm_routers:
+        flags |= 0x40
+    rotation_time = 672 if policy.rotation_time is None else policy.rotation_time
+    return _int_to_bytes(rotation_time, 2, "rotation time") + flags.to_bytes(2, "big")
+
+
+def _active_dataset_from_tlv(
+    dataset: ActiveDataSet,
+    items: dict[MeshcopTLVType | int, MeshcopTLVItem],
+) -> ActiveDataSet:
+    """Set the fields of an active dataset from parsed TLV items."""
+    if item := items.get(MeshcopTLVType.ACTIVETIMESTAMP):
+        dataset.active_timestamp = _timestamp_from_tlv(item)
+    if item := items.get(MeshcopTLVType.CHANNELMASK):
+        dataset.channel_mask = _decode_item(item, tlv_parser.ChannelMask).masks.get(0)
+    if item := items.get(MeshcopTLVType.CHANNEL):
+        dataset.channel = _channel_from_tlv(item)
+    if item := items.get(MeshcopTLVType.EXTPANID):
+        dataset.extended_pan_id = item.data.hex().upper()
+    if item := items.get(MeshcopTLVType.MESHLOCALPREFIX):
+        prefix = _decode_item(item, tlv_parser.MeshLocalPrefix).prefix
+        dataset.mesh_local_prefix = str(prefix)
+    if item := items.get(MeshcopTLVType.NETWORKKEY):
+        dataset.network_key = item.data.hex().upper()
+    if item := items.get(MeshcopTLVType.NETWORKNAME):
+        dataset.network_name = _decode_item(item, tlv_parser.NetworkName).name
+    if item := items.get(MeshcopTLVType.PANID):
+        dataset.pan_id = _decode_item(item, tlv_parser.Integer).value
+    if item := items.get(MeshcopTLVType.PSKC):
+        dataset.psk_c = item.data.hex().upper()
+    if item := items.get(MeshcopTLVType.SECURITYPOLICY):
+        dataset.security_policy = _security_policy_from_tlv(item)
+    return dataset
+
+
+def _active_dataset_to_tlv(
+    dataset: ActiveDataSet,
+) -> dict[MeshcopTLVType | int, MeshcopTLVItem]:
+    """Return the fields of an active dataset which are set as TLV items."""
+    values: dict[MeshcopTLVType, bytes] = {}
+    if dataset.active_timestamp is not None:
+        values[MeshcopTLVType.ACTIVETIMESTAMP] = _timestamp_to_tlv(
+            dataset.active_timestamp
+        )
+    if dataset.channel is not None:
+        # Channel page 0
+        values[MeshcopTLVType.CHANNEL] = b"\x00" + _int_to_bytes(
+            dataset.channel, 2, "channel"
+        )
+    if dataset.channel_mask is not None:
+        # Channel page 0, the mask is sent with channel 0 in the most significant bit
+        _int_to_bytes(dataset.channel_mask, 4, "channel mask")
+        mask = int(f"{dataset.channel_mask:032b}"[::-1], 2)
+        values[MeshcopTLVType.CHANNELMASK] = b"\x00\x04" + mask.to_bytes(4, "big")
+    if dataset.extended_pan_id is not None:
+        values[MeshcopTLVType.EXTPANID] = bytes.fromhex(dataset.extended_pan_id)
+    if dataset.mesh_local_prefix is not None:
+        prefix = ipaddress.IPv6Network(dataset.mesh_local_prefix)
+        values[MeshcopTLVType.MESHLOCALPREFIX] = prefix.network_address.packed[:8]
+    if dataset.network_key is not None:
+        values[MeshcopTLVType.NETWORKKEY] = bytes.fromhex(dataset.network_key)
+    if dataset.network_name is not None:
+        values[MeshcopTLVType.NETWORKNAME] = dataset.network_name.encode()
+    if dataset.pan_id is not None:
+        values[MeshcopTLVType.PANID] = _int_to_bytes(dataset.pan_id, 2, "PAN ID")
+    if dataset.psk_c is not None:
+        values[MeshcopTLVType.PSKC] = bytes.fromhex(dataset.psk_c)
+    if dataset.security_policy is not None:
+        values[MeshcopTLVType.SECURITYPOLICY] = _security_policy_to_tlv(
+            dataset.security_policy
+        )
+    return {tag: MeshcopTLVItem(tag, value) for tag, value in values.items()}
+
+
+_DataSetT = TypeVar("_DataSetT", ActiveDataSet, PendingDataSet)
+
+
+class DataSetInternTable:
+    """Table of interned datasets.
+
+    Interning replaces a dataset by an equal one already in the table, so identical
+    datasets, e.g. fetched from routers on the same Thread network, share one object.
+    The table doesn't keep datasets alive. Interned datasets are shared, so they
+    should not be modified in place, use replace() instead.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._datasets: weakref.WeakValueDictionary[
+            bytes, ActiveDataSet | PendingDataSet
+        ] = weakref.WeakValueDictionary()
+
+    def __len__(self) -> int:
+        """Return the number of interned datasets."""
+        return len(self._datasets)
+
+    def intern(self, dataset: _DataSetT) -> _DataSetT:
+        """Return the interned dataset equal to dataset, adding it if needed."""
+        key = dataset.content_hash()
+        existing = self._datasets.get(key)
+        if isinstance(existing, type(dataset)) and existing == dataset:
+            return existing
+        self._datasets[key] = dataset
+        return dataset
+
+
+def _diff_models(old: Any, new: Any, prefix: str, result: dict[str, Any]) -> None:
+    """Add the changed fields of two models of the same type to result."""
+    # The generated __match_args__ lists the fields, and is cheaper than fields()
+    for name in old.__match_args__:
+        old_value = getattr(old, name)
+        new_value = getattr(new, name)
+        if old_value == new_value:
+            continue
+        if is_dataclass(old_value) and isinstance(new_value, type(old_value)):
+            _diff_models(old_value, new_value, f"{prefix}{name}.", result)
+        else:
+            result[f"{prefix}{name}"] = (old_value, new_value)
+
+
+# Names of the fields a TLV item type decodes from its value, by item type
+_DECODED_FIELDS: dict[type[MeshcopTLVItem], tuple[str, ...]] = {}
+
+
+def _decoded_fields(item_type: type[MeshcopTLVItem]) -> tuple[str, ...]:
+    """Return the names of the fields decoded from the value of a TLV item."""
+    if (names := _DECODED_FIELDS.get(item_type)) is None:
+        names = _DECODED_FIELDS[item_type] = tuple(
+            item_field.name for item_field in fields(item_type) if not item_field.init
+        )
+    return names
+
+
+def _diff_items(
+    tag: MeshcopTLVType | int,
+    old: MeshcopTLVItem,
+    new: MeshcopTLVItem,
+    result: dict[Any, tuple[Any, Any]],
+) -> None:
+    """Add the changed decoded fields of two TLV items with the same tag to result.
+
+    Items which don't decode their value, or whose decoded fields are equal, are
+    added as a whole.
+    """
+    if type(new) is type(old) and (names := _decoded_fields(type(old))):
+        prefix = tag.name if isinstance(tag, MeshcopTLVType) else str(tag)
+        changed = False
+        for name in names:
+            if (old_value := getattr(old, name)) != (new_value := getattr(new, name)):
+                result[f"{prefix}.{name}"] = (old_value, new_value)
+                changed = True
+        if changed:
+            return
+    result[tag] = (old, new)
+
+
+@overload
+def diff(old: ActiveDataSet, new: ActiveDataSet) -> dict[str, tuple[Any, Any]]: ...
+
+
+@overload
+def diff(old: PendingDataSet, new: PendingDataSet) -> dict[str, tuple[Any, Any]]: ...
+
+
+@overload
+def diff(
+    old: Mapping[MeshcopTLVType | int, MeshcopTLVItem],
+    new: Mapping[MeshcopTLVType | int, MeshcopTLVItem],
+) -> dict[MeshcopTLVType | int | str, tuple[Any, Any]]: ...
+
+
+def diff(old: Any, new: Any) -> dict[Any, tuple[Any, Any]]:
+    """Return the fields which differ between two datasets.
+
+    The datasets are either models of the same type or parsed TLV datasets. Changed
+    fields of models map to their (old, new) values, fields of nested models are
+    reported as e.g. "security_policy.routers" as long as the nested model is set
+    on both sides. Changed values of TLV items present in both TLV datasets are
+    reported by decoded field, as e.g. "SECURITYPOLICY.routers", other changed
+    items map their tag to the (old, new) items, with None for an item missing on
+    one side.
+
+    Raises TypeError if the datasets can't be compared.
+    """
+    result: dict[Any, tuple[Any, Any]] = {}
+    if isinstance(old, (ActiveDataSet, PendingDataSet)) and type(new) is type(old):
+        if old != new:
+            _diff_models(old, new, "", result)
+        return result
+    if isinstance(old, Mapping) and isinstance(new, Mapping):
+        for tag, old_item in old.items():
+            if (new_item := new.get(tag)) is None:
+                result[tag] = (old_item, None)
+            elif new_item != old_item:
+                _diff_items(tag, old_item, new_item, result)
+        for tag, new_item in new.items():
+            if tag not in old:
+                result[tag] = (None, new_item)
+        return result
+    raise TypeError(f"can't diff {type(old).__name__} and {type(new).__name__}")
@@ -3,17 +3,55 @@
 Based on https://github.com/openthread/ot-br-posix/blob/main/src/utils/pskc.cpp
 """
 
+from __future__ import annotations
+
+import asyncio
+from collections import OrderedDict
+from collections.abc import Iterable, Mapping
+from concurrent.futures import Executor, ProcessPoolExecutor
+from dataclasses import dataclass
+import hashlib
+import hmac
+import os
 import struct
+import time
 
 from cryptography.hazmat.primitives import cmac
 from cryptography.hazmat.primitives.ciphers import algorithms
 
+from .models import ActiveDataSet
+from .tlv_parser import MeshcopTLVItem, MeshcopTLVType, NetworkName
+
 AES_128_KEY_LEN = 16
 ITERATION_COUNTS = 16384
 BLKSIZE = 16
 SALT_PREFIX = "Thread".encode()
 
 
+@dataclass(slots=True)
+class _PendingPSKc:
+    """PSKc computation shared by concurrent callers."""
+
+    future: asyncio.Future[bytes]
+    waiters: int = 0
+
+
+_PENDING: dict[bytes, _PendingPSKc] = {}
+
+# Keys the input digests, so they can't be used to test passphrase guesses faster
+# than the PSKc derivation allows
+_INPUT_KEY_SECRET = os.urandom(32)
+
+
+def _input_key(ext_pan_id: bytes, network_name: str, passphrase: str) -> bytes:
+    """Return a digest identifying the inputs, so the passphrase isn't kept."""
+    digest = hmac.new(_INPUT_KEY_SECRET, digestmod=hashlib.sha256)
+    for part in (ext_pan_id, network_name.encode(), passphrase.encode()):
+        digest.update(len(part).to_bytes(4, "big"))
+        digest.update(part)
+    return digest.digest()
+
+
 def _derive_key(passphrase: str) -> bytes:
     """Derive key from passphrase according to RFC 4615."""
     passphrase_bytes = passphrase.encode()
@@ -32,22 +70,228 @@ def compute_pskc(ext_pan_id: bytes, network_name: str, passphrase: str) -> bytes
     block_counter = 1
     prf_input = salt + struct.pack("!L", block_counter)
 
+    # Set up the keyed CMAC once, each iteration works on a copy of it
+    keyed_cmac = cmac.CMAC(algorithms.AES128(key))
+
     # Calculate U_1
-    c = cmac.CMAC(algorithms.AES128(key))
+    c = keyed_cmac.copy()
     c.update(prf_input)
     prf_output = c.finalize()
-    pskc = bytearray(prf_output)
+    pskc = int.from_bytes(prf_output, "big")
 
     for _ in range(ITERATION_COUNTS - 1):
         prf_input = prf_output
 
         # Calculate U_i
-        c = cmac.CMAC(algorithms.AES128(key))
+        c = keyed_cmac.copy()
         c.update(prf_input)
         prf_output = c.finalize()
 
-        # xor
-        for i in range(BLKSIZE):
-            pskc[i] ^= prf_output[i]
+        # xor, as one 128-bit int. The CMAC calls dominate the loop and can't be
+        # batched across inputs with different keys, so vectorizing the xor over
+        # many derivations (e.g. with NumPy) doesn't pay off.
+        pskc ^= int.from_bytes(prf_output, "big")
+
+    return pskc.to_bytes(BLKSIZE, "big")
+
+
+def compute_pskc_many(
+    inputs: Iterable[tuple[bytes, str, str]], executor: Executor | None = None
+) -> list[bytes]:
+    """Compute Thread PSKc for many (ext PAN ID, network name, passphrase) tuples.
+
+    The computation is CPU bound, so it's spread over a process pool. If no executor
+    is passed, a ProcessPoolExecutor is created for the call.
+    The results are returned in input order.
+    """
+    batch = list(inputs)
+    if not batch:
+        return []
+    if executor is None:
+        if len(batch) == 1:
+            return [compute_pskc(*batch[0])]
+        with ProcessPoolExecutor(
+            max_workers=min(len(batch), os.cpu_count() or 1)
+        ) as pool:
+            return list(pool.map(compute_pskc, *zip(*batch)))
+    return list(executor.map(compute_pskc, *zip(*batch)))
+
+
+class PSKcCache:
+    """Bounded LRU cache of derived PSKc values.
+
+    Entries are keyed on a digest of the inputs, the passphrase isn't stored. If a
+    ttl is set, entries older than ttl seconds are evicted.
+    """
+
+    def __init__(self, maxsize: int = 128, ttl: float | None = None) -> None:
+        """Initialize."""
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._entries: OrderedDict[bytes, tuple[float, bytes]] = OrderedDict()
+
+    def __len__(self) -> int:
+        """Return the number of cached entries."""
+        return len(self._entries)
+
+    def clear(self) -> None:
+        """Remove all entries."""
+        self._entries.clear()
+
+    def compute(self, ext_pan_id: bytes, network_name: str, passphrase: str) -> bytes:
+        """Return the cached PSKc, computing it on a miss."""
+        key = _input_key(ext_pan_id, network_name, passphrase)
+        if (pskc := self._get(key)) is None:
+            pskc = compute_pskc(ext_pan_id, network_name, passphrase)
+            self._put(key, pskc)
+        return pskc
+
+    def get(
+        self, ext_pan_id: bytes, network_name: str, passphrase: str
+    ) -> bytes | None:
+        """Return the cached PSKc, or None on a miss."""
+        return self._get(_input_key(ext_pan_id, network_name, passphrase))
+
+    def put(
+        self, ext_pan_id: bytes, network_name: str, passphrase: str, pskc: bytes
+    ) -> None:
+        """Store a PSKc."""
+        self._put(_input_key(ext_pan_id, network_name, passphrase), pskc)
+
+    def _get(self, key: bytes) -> bytes | None:
+        """Return the cached PSKc for an input key and count the hit or miss."""
+        if (entry := self._entries.get(key)) is not None:
+            created, pskc = entry
+            if self.ttl is None or time.monotonic() - created < self.ttl:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return pskc
+            del self._entries[key]
+        self.misses += 1
+        return None
+
+    def _put(self, key: bytes, pskc: bytes) -> None:
+        """Store the PSKc for an input key, evicting the least recently used."""
+        self._entries[key] = (time.monotonic(), pskc)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+
+async def async_compute_pskc(
+    ext_pan_id: bytes,
+    network_name: str,
+    passphrase: str,
+    executor: Executor | None = None,
+    cache: PSKcCache | None = None,
+) -> bytes:
+    """Compute Thread PSKc without blocking the event loop.
+
+    The computation runs in the executor, or the loop's default executor if none is
+    passed. Concurrent calls with the same inputs share one computation. Cancelling a
+    call doesn't affect the other callers, the computation is cancelled if it has
+    not started yet and no caller is left waiting for it.
+    If a cache is passed, it's checked first and updated with the result.
+    """
+    if (
+        cache is not None
+        and (pskc := cache.get(ext_pan_id, network_name, passphrase)) is not None
+    ):
+        return pskc
+
+    loop = asyncio.get_running_loop()
+    key = _input_key(ext_pan_id, network_name, passphrase)
+
+    if (pending := _PENDING.get(key)) is None or pending.future.get_loop() is not loop:
+        pending = _PendingPSKc(
+            loop.run_in_executor(
+                executor, compute_pskc, ext_pan_id, network_name, passphrase
+            )
+        )
+        _PENDING[key] = pending
+
+        def _remove_pending(_: asyncio.Future[bytes]) -> None:
+            if _PENDING.get(key) is pending:
+                del _PENDING[key]
+
+        pending.future.add_done_callback(_remove_pending)
+
+    pending.waiters += 1
+    try:
+        pskc = await asyncio.shield(pending.future)
+    except asyncio.CancelledError:
+        if pending.waiters == 1:
+            pending.future.cancel()
+        raise
+    finally:
+        pending.waiters -= 1
+
+    if cache is not None:
+        cache.put(ext_pan_id, network_name, passphrase, pskc)
+    return pskc
+
+
+def _pskc_inputs(
+    dataset: ActiveDataSet | Mapping[MeshcopTLVType | int, MeshcopTLVItem],
+) -> tuple[bytes, str, bytes]:
+    """Return the ext PAN ID, network name and PSKc of a dataset.
+
+    Raises ValueError if the dataset lacks one of them.
+    """
+    if isinstance(dataset, ActiveDataSet):
+        if (
+            dataset.extended_pan_id is None
+            or dataset.network_name is None
+            or dataset.psk_c is None
+        ):
+            raise ValueError("dataset has no ext PAN ID, network name or PSKc")
+        return (
+            bytes.fromhex(dataset.extended_pan_id),
+            dataset.network_name,
+            bytes.fromhex(dataset.psk_c),
+        )
+
+    ext_pan_id = dataset.get(MeshcopTLVType.EXTPANID)
+    network_name = dataset.get(MeshcopTLVType.NETWORKNAME)
+    pskc = dataset.get(MeshcopTLVType.PSKC)
+    if ext_pan_id is None or not isinstance(network_name, NetworkName) or pskc is None:
+        raise ValueError("dataset has no ext PAN ID, network name or PSKc")
+    return ext_pan_id.data, network_name.name, pskc.data
+
+
+def verify_pskc(
+    dataset: ActiveDataSet | Mapping[MeshcopTLVType | int, MeshcopTLVItem],
+    passphrase: str,
+    cache: PSKcCache | None = None,
+) -> bool:
+    """Check the PSKc of a dataset or parsed TLV dataset against a passphrase.
+
+    If a cache is passed, the derived PSKc is looked up there first.
+    Raises ValueError if the dataset has no ext PAN ID, network name or PSKc.
+    """
+    ext_pan_id, network_name, pskc = _pskc_inputs(dataset)
+    if cache is not None:
+        expected = cache.compute(ext_pan_id, network_name, passphrase)
+    else:
+        expected = compute_pskc(ext_pan_id, network_name, passphrase)
+    return hmac.compare_digest(expected, pskc)
+
+
+async def async_verify_pskc(
+    dataset: ActiveDataSet | Mapping[MeshcopTLVType | int, MeshcopTLVItem],
+    passphrase: str,
+    executor: Executor | None = None,
+    cache: PSKcCache | None = None,
+) -> bool:
+    """Check the PSKc of a dataset without blocking the event loop.
 
-    return bytes(pskc)
+    See async_compute_pskc for how the executor and cache are used.
+    Raises ValueError if the dataset has no ext PAN ID, network name or PSKc.
+    """
+    ext_pan_id, network_name, pskc = _pskc_inputs(dataset)
+    expected = await async_compute_pskc(
+        ext_pan_id, network_name, passphrase, executor, cache
+    )
+    return hmac.compare_digest(expected, pskc)
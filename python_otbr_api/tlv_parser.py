@@ -2,13 +2,20 @@
 
 from __future__ import annotations
 
+from collections.abc import Iterable, Iterator, Mapping
+from concurrent.futures import Executor
 from dataclasses import dataclass, field
 from enum import IntEnum
+import hashlib
+import ipaddress
 import struct
 import logging
 
 _LOGGER = logging.getLogger(__name__)
 
+# A length byte of 0xFF is followed by a 16 bit length, in extended TLVs
+_EXTENDED_LENGTH = 0xFF
+
 
 class TLVError(Exception):
     """TLV error."""
@@ -62,7 +69,7 @@ class MeshcopTLVType(IntEnum):
     JOINERADVERTISEMENT = 241
 
 
-@dataclass
+@dataclass(slots=True)
 class MeshcopTLVItem:
     """Base class for TLV items."""
 
@@ -74,7 +81,7 @@ class MeshcopTLVItem:
         return self.data.hex()
 
 
-@dataclass
+@dataclass(slots=True)
 class Channel(MeshcopTLVItem):
     """Channel."""
 
@@ -87,7 +94,7 @@ class Channel(MeshcopTLVItem):
             raise TLVError(f"invalid channel '{self.channel}'")
 
 
-@dataclass
+@dataclass(slots=True)
 class NetworkName(MeshcopTLVItem):
     """Network name."""
 
@@ -104,7 +111,7 @@ class NetworkName(MeshcopTLVItem):
         return self.name
 
 
-@dataclass
+@dataclass(slots=True)
 class Timestamp(MeshcopTLVItem):
     """Timestamp."""
 
@@ -116,85 +123,495 @@ class Timestamp(MeshcopTLVItem):
         """Decode the timestamp."""
         # The timestamps are packed in 8 bytes:
         # [seconds 48 bits][ticks 15 bits][authoritative flag 1 bit]
+        if len(self.data) != 8:
+            raise TLVError(f"invalid timestamp '{self.data.hex()}'")
         unpacked: int = struct.unpack("!Q", self.data)[0]
         self.authoritative = bool(unpacked & 1)
         self.seconds = unpacked >> 16
         self.ticks = (unpacked >> 1) & 0x7FFF
 
 
-def _encode_item(item: MeshcopTLVItem) -> bytes:
-    """Encode a dataset item to TLV format."""
-    data_len = len(item.data)
-    return struct.pack(f"!BB{data_len}s", item.tag, data_len, item.data)
+@dataclass(slots=True)
+class Integer(MeshcopTLVItem):
+    """Big endian unsigned integer."""
 
+    value: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Decode the integer."""
+        self.value = int.from_bytes(self.data, "big")
+
+
+@dataclass(slots=True)
+class State(Integer):
+    """Commissioning state, 1 for accept, 0 for pending and -1 for reject."""
+
+    def __post_init__(self) -> None:
+        """Decode the state."""
+        self.value = int.from_bytes(self.data, "big", signed=True)
+
+
+@dataclass(slots=True)
+class Text(MeshcopTLVItem):
+    """UTF-8 encoded string."""
+
+    text: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Decode the string."""
+        try:
+            self.text = self.data.decode()
+        except UnicodeDecodeError as err:
+            raise TLVError(f"invalid text '{self.data.hex()}'") from err
+
+    def __str__(self) -> str:
+        return self.text
+
+
+@dataclass(slots=True)
+class IPv6Address(MeshcopTLVItem):
+    """IPv6 address."""
+
+    address: ipaddress.IPv6Address = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Decode the address."""
+        if len(self.data) != 16:
+            raise TLVError(f"invalid ipv6 address '{self.data.hex()}'")
+        self.address = ipaddress.IPv6Address(self.data)
 
-def encode_tlv(items: dict[MeshcopTLVType | int, MeshcopTLVItem]) -> str:
-    """Encode a TLV encoded dataset to a hex string.
+
+@dataclass(slots=True)
+class MeshLocalPrefix(MeshcopTLVItem):
+    """Mesh local prefix."""
+
+    prefix: ipaddress.IPv6Network = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Decode the prefix."""
+        if len(self.data) != 8:
+            raise TLVError(f"invalid mesh local prefix '{self.data.hex()}'")
+        self.prefix = ipaddress.IPv6Network((self.data + bytes(8), 64))
+
+
+@dataclass(slots=True)
+class ChannelMask(MeshcopTLVItem):
+    """Channel mask."""
+
+    # Channel page to mask, bit n of the mask is set if channel n is included
+    masks: dict[int, int] = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Decode the channel mask entries."""
+        self.masks = {}
+        data = self.data
+        pos = 0
+        while pos < len(data):
+            if pos + 2 > len(data) or pos + 2 + data[pos + 1] > len(data):
+                raise TLVError(f"invalid channel mask '{data.hex()}'")
+            page, mask_len = data[pos], data[pos + 1]
+            pos += 2
+            # The mask is transmitted with channel 0 in the most significant bit
+            mask = int.from_bytes(data[pos : pos + mask_len], "big")
+            self.masks[page] = int(f"{mask:0{mask_len * 8}b}"[::-1], 2)
+            pos += mask_len
+
+
+@dataclass(slots=True)
+class SecurityPolicy(MeshcopTLVItem):  # pylint: disable=too-many-instance-attributes
+    """Security policy."""
+
+    rotation_time: int = field(init=False)
+    obtain_network_key: bool = field(init=False)
+    native_commissioning: bool = field(init=False)
+    routers: bool = field(init=False)
+    external_commissioning: bool = field(init=False)
+    commercial_commissioning: bool = field(init=False)
+    autonomous_enrollment: bool = field(init=False)
+    network_key_provisioning: bool = field(init=False)
+    to_ble_link: bool = field(init=False)
+    non_ccm_routers: bool = field(init=False)
+    version_threshold_for_routing: int = field(init=False)
+
+    def __post_init__(self) -> None:
+        """Decode the security policy."""
+        # [rotation time 16 bits][flags 8 or 16 bits], some of the flags are set
+        # when the feature is disabled
+        data = self.data
+        if len(data) < 3:
+            raise TLVError(f"invalid security policy '{data.hex()}'")
+        self.rotation_time = int.from_bytes(data[:2], "big")
+        self.obtain_network_key = bool(data[2] & 0x80)
+        self.native_commissioning = bool(data[2] & 0x40)
+        self.routers = bool(data[2] & 0x20)
+        self.external_commissioning = bool(data[2] & 0x10)
+        self.commercial_commissioning = not data[2] & 0x04
+        self.autonomous_enrollment = not data[2] & 0x02
+        self.network_key_provisioning = not data[2] & 0x01
+        # Thread 1.1 policies don't have the second flags byte
+        flags = data[3] if len(data) > 3 else 0xF8
+        self.to_ble_link = bool(flags & 0x80)
+        self.non_ccm_routers = not flags & 0x40
+        self.version_threshold_for_routing = flags & 0x07
+
+
+def encode_tlv_bytes(items: dict[MeshcopTLVType | int, MeshcopTLVItem]) -> bytes:
+    """Encode a TLV encoded dataset to bytes.
 
     Raises if the TLV is invalid.
     """
-    result = b""
+    values = items.values()
+    result = bytearray(sum(len(item.data) + 2 for item in values))
+    pos = 0
+
+    for item in values:
+        data_len = len(item.data)
+        # Longer values would need the extended form, which datasets don't use
+        if data_len >= _EXTENDED_LENGTH:
+            raise TLVError(f"value of tag {item.tag!r} too long: {data_len} bytes")
+        result[pos] = item.tag
+        result[pos + 1] = data_len
+        pos += 2
+        result[pos : pos + data_len] = item.data
+        pos += data_len
 
-    for item in items.values():
-        result += _encode_item(item)
+    return bytes(result)
 
-    return result.hex()
+
+def encode_tlv(items: dict[MeshcopTLVType | int, MeshcopTLVItem]) -> str:
+    """Encode a TLV encoded dataset to a hex string.
+
+    Raises if the TLV is invalid.
+    """
+    return encode_tlv_bytes(items).hex()
+
+
+# Lookup tables indexed by the raw tag byte, unknown tags map to the raw int
+_TAG_TYPES: list[MeshcopTLVType | int] = list(range(256))
+for _tlv_type in MeshcopTLVType:
+    _TAG_TYPES[_tlv_type] = _tlv_type
+_DECODERS: list[type[MeshcopTLVItem]] = [MeshcopTLVItem] * 256
+
+
+def register_decoder(tag: MeshcopTLVType | int, decoder: type[MeshcopTLVItem]) -> None:
+    """Register the class used to decode items with the given tag."""
+    if not 0 <= tag <= 255:
+        raise ValueError(f"invalid tag {tag!r}")
+    _DECODERS[tag] = decoder
+
+
+for _tlv_type, _decoder in (
+    (MeshcopTLVType.CHANNEL, Channel),
+    (MeshcopTLVType.PANID, Integer),
+    (MeshcopTLVType.NETWORKNAME, NetworkName),
+    (MeshcopTLVType.NETWORK_KEY_SEQUENCE, Integer),
+    (MeshcopTLVType.MESHLOCALPREFIX, MeshLocalPrefix),
+    (MeshcopTLVType.BORDER_AGENT_RLOC, Integer),
+    (MeshcopTLVType.COMMISSIONER_ID, Text),
+    (MeshcopTLVType.COMM_SESSION_ID, Integer),
+    (MeshcopTLVType.SECURITYPOLICY, SecurityPolicy),
+    (MeshcopTLVType.ACTIVETIMESTAMP, Timestamp),
+    (MeshcopTLVType.COMMISSIONER_UDP_PORT, Integer),
+    (MeshcopTLVType.STATE, State),
+    (MeshcopTLVType.JOINER_UDP_PORT, Integer),
+    (MeshcopTLVType.JOINER_RLOC, Integer),
+    (MeshcopTLVType.DURATION, Integer),
+    (MeshcopTLVType.PROVISIONING_URL, Text),
+    (MeshcopTLVType.VENDOR_NAME_TLV, Text),
+    (MeshcopTLVType.VENDOR_MODEL_TLV, Text),
+    (MeshcopTLVType.VENDOR_SW_VERSION_TLV, Text),
+    (MeshcopTLVType.IPV6_ADDRESS_TLV, IPv6Address),
+    (MeshcopTLVType.PENDINGTIMESTAMP, Timestamp),
+    (MeshcopTLVType.DELAYTIMER, Integer),
+    (MeshcopTLVType.CHANNELMASK, ChannelMask),
+    (MeshcopTLVType.COUNT, Integer),
+    (MeshcopTLVType.PERIOD, Integer),
+    (MeshcopTLVType.SCAN_DURATION, Integer),
+    (MeshcopTLVType.THREAD_DOMAIN_NAME, Text),
+    (MeshcopTLVType.WAKEUP_CHANNEL, Channel),
+):
+    register_decoder(_tlv_type, _decoder)
 
 
 def _parse_item(tag: MeshcopTLVType | int, data: bytes) -> MeshcopTLVItem:
     """Parse a TLV encoded dataset item."""
-    if tag == MeshcopTLVType.ACTIVETIMESTAMP:
-        return Timestamp(tag, data)
-    if tag == MeshcopTLVType.CHANNEL:
-        return Channel(tag, data)
-    if tag == MeshcopTLVType.NETWORKNAME:
-        return NetworkName(tag, data)
+    return _DECODERS[tag](tag, data)
 
-    return MeshcopTLVItem(tag, data)
 
+def parse_tlv(
+    data: str, *, trusted: bool = False
+) -> dict[MeshcopTLVType | int, MeshcopTLVItem]:
+    """Parse a hex encoded TLV dataset.
 
-def parse_tlv(data: str) -> dict[MeshcopTLVType | int, MeshcopTLVItem]:
-    """Parse a TLV encoded dataset.
-
+    See parse_tlv_bytes for the meaning of trusted.
     Raises if the TLV is invalid.
     """
     try:
         data_bytes = bytes.fromhex(data)
     except ValueError as err:
         raise TLVError("invalid tlvs") from err
-    result = {}
+    return parse_tlv_bytes(data_bytes, trusted=trusted)
+
+
+def _as_bytes(buf: bytes | bytearray | memoryview) -> bytes:
+    """Return the buffer as bytes, copying only if needed."""
+    # Slicing bytes is cheaper than slicing a memoryview and then copying the
+    # slice, so only buffers which are not already bytes are copied up front.
+    return buf if isinstance(buf, bytes) else bytes(buf)
+
+
+def _index_tlv(
+    data: bytes, *, log_unknown: bool = True
+) -> dict[MeshcopTLVType | int, tuple[int, int]]:
+    """Index the value offsets of a TLV encoded dataset.
+
+    Unknown tags are logged unless log_unknown is False.
+    Raises if the TLV framing is invalid or a tag is duplicated.
+    """
+    result: dict[MeshcopTLVType | int, tuple[int, int]] = {}
     pos = 0
-    length = len(data_bytes)
+    length = len(data)
 
     while pos < length:
         if pos + 2 > length:
             raise TLVError("truncated tlv header")
 
-        raw_tag = data_bytes[pos]
-        pos += 1
+        raw_tag = data[pos]
+        _len = data[pos + 1]
+        pos += 2
 
         # Unknown tags should still be passed through
-        tag: MeshcopTLVType | int
-
-        try:
-            tag = MeshcopTLVType(raw_tag)
-        except ValueError:
-            tag = raw_tag
-
-        _len = data_bytes[pos]
-        pos += 1
+        tag = _TAG_TYPES[raw_tag]
 
         if pos + _len > length:
             raise TLVError(f"expected {_len} bytes for tag {tag!r}, got {length - pos}")
 
-        val = data_bytes[pos : pos + _len]
-        pos += _len
-
         # Once we have the value, we can log a warning about the unknown TLV
-        if not isinstance(tag, MeshcopTLVType):
-            _LOGGER.warning("unknown TLV type %d=%r", raw_tag, val)
+        if log_unknown and not isinstance(tag, MeshcopTLVType):
+            _LOGGER.warning("unknown TLV type %d=%r", raw_tag, data[pos : pos + _len])
 
         if tag in result:
             raise TLVError(f"duplicated tag {tag!r}")
-        result[tag] = _parse_item(tag, val)
+        result[tag] = (pos, pos + _len)
+        pos += _len
     return result
+
+
+def _parse_tlv_trusted(data: bytes) -> dict[MeshcopTLVType | int, MeshcopTLVItem]:
+    """Parse a TLV encoded dataset without the checks for malformed datasets."""
+    result: dict[MeshcopTLVType | int, MeshcopTLVItem] = {}
+    pos = 0
+    length = len(data)
+
+    while pos < length:
+        raw_tag = data[pos]
+        end = pos + 2 + data[pos + 1] if pos + 1 < length else length + 1
+        if end > length:
+            raise TLVError("truncated tlv")
+        tag = _TAG_TYPES[raw_tag]
+        result[tag] = _DECODERS[raw_tag](tag, data[pos + 2 : end])
+        pos = end
+    return result
+
+
+def parse_tlv_bytes(
+    buf: bytes | bytearray | memoryview, *, trusted: bool = False
+) -> dict[MeshcopTLVType | int, MeshcopTLVItem]:
+    """Parse a TLV encoded dataset.
+
+    By default the dataset is fully checked: truncated items and duplicated tags
+    are rejected, unknown tags are logged and the values of the items are
+    validated when they are decoded.
+
+    With trusted=True, e.g. for datasets this library encoded, duplicated tags are
+    not detected, the last one wins, and unknown tags are not logged. Truncated
+    items are still rejected, with a less detailed error, and the values of the
+    items are still validated when they are decoded.
+
+    Raises if the TLV is invalid.
+    """
+    data = _as_bytes(buf)
+    if trusted:
+        return _parse_tlv_trusted(data)
+    return {
+        tag: _parse_item(tag, data[start:end])
+        for tag, (start, end) in _index_tlv(data).items()
+    }
+
+
+def tlv_content_hash(buf: bytes | bytearray | memoryview) -> bytes:
+    """Return a stable hash of the items of a TLV encoded dataset.
+
+    The items are hashed in tag order, so datasets with the same items in a
+    different order hash the same. The hash doesn't change between processes.
+
+    Raises if the TLV framing is invalid or a tag is duplicated.
+    """
+    data = _as_bytes(buf)
+    # Meant to be called often, e.g. on every poll, so unknown tags aren't logged
+    index = _index_tlv(data, log_unknown=False)
+    digest = hashlib.blake2b(digest_size=16)
+    for tag in sorted(index):
+        start, end = index[tag]
+        digest.update(bytes((tag, end - start)))
+        digest.update(data[start:end])
+    return digest.digest()
+
+
+def _parse_tlv_chunk(
+    datasets: list[str | bytes],
+) -> list[dict[MeshcopTLVType | int, MeshcopTLVItem] | TLVError]:
+    """Parse a chunk of TLV encoded datasets, returning errors instead of raising."""
+    results: list[dict[MeshcopTLVType | int, MeshcopTLVItem] | TLVError] = []
+    for data in datasets:
+        try:
+            if isinstance(data, str):
+                results.append(parse_tlv(data))
+            else:
+                results.append(parse_tlv_bytes(data))
+        except TLVError as err:
+            results.append(err)
+    return results
+
+
+def parse_tlv_many(
+    datasets: Iterable[str | bytes | bytearray | memoryview],
+    *,
+    executor: Executor | None = None,
+    chunk_size: int = 256,
+) -> list[dict[MeshcopTLVType | int, MeshcopTLVItem] | TLVError]:
+    """Parse many hex or TLV encoded datasets.
+
+    Returns one entry per dataset, in input order: the parsed dataset, or the
+    TLVError raised when parsing it.
+
+    If an executor is passed, the datasets are parsed in chunks by the executor,
+    a ProcessPoolExecutor can be used to spread very large batches over CPUs.
+    """
+    batch = [data if isinstance(data, str) else _as_bytes(data) for data in datasets]
+    if executor is None:
+        return _parse_tlv_chunk(batch)
+
+    chunks = [batch[pos : pos + chunk_size] for pos in range(0, len(batch), chunk_size)]
+    return [
+        result for chunk in executor.map(_parse_tlv_chunk, chunks) for result in chunk
+    ]
+
+
+class LazyDataset(Mapping[MeshcopTLVType | int, MeshcopTLVItem]):
+    """TLV encoded dataset which decodes items only when they are accessed.
+
+    The TLV framing is validated when the dataset is created, the values of the
+    items are validated when they are first accessed.
+    """
+
+    def __init__(self, buf: bytes | bytearray | memoryview) -> None:
+        """Initialize."""
+        self._data = _as_bytes(buf)
+        self._offsets = _index_tlv(self._data)
+        self._items: dict[MeshcopTLVType | int, MeshcopTLVItem] = {}
+
+    @classmethod
+    def from_hex(cls, data: str) -> LazyDataset:
+        """Create from a hex encoded TLV dataset."""
+        try:
+            data_bytes = bytes.fromhex(data)
+        except ValueError as err:
+            raise TLVError("invalid tlvs") from err
+        return cls(data_bytes)
+
+    def __getitem__(self, tag: MeshcopTLVType | int) -> MeshcopTLVItem:
+        """Return the decoded item for a tag."""
+        if (item := self._items.get(tag)) is None:
+            start, end = self._offsets[tag]
+            item = self._items[tag] = _parse_item(tag, self._data[start:end])
+        return item
+
+    def __contains__(self, tag: object) -> bool:
+        """Return if the dataset has an item for a tag, without decoding it."""
+        return tag in self._offsets
+
+    def __iter__(self) -> Iterator[MeshcopTLVType | int]:
+        """Iterate over the tags."""
+        return iter(self._offsets)
+
+    def __len__(self) -> int:
+        """Return the number of items."""
+        return len(self._offsets)
+
+
+class TLVStreamDecoder:
+    """Incremental decoder for TLV encoded data which arrives in chunks.
+
+    Items are returned by feed as soon as they are complete, an item may be split
+    over several chunks. Duplicated tags are passed through, since a stream may
+    contain several messages. Extended TLVs, with a length byte of 0xFF followed by
+    a 16 bit length, are supported.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self._buffer = bytearray()
+        self._items: list[MeshcopTLVItem] = []
+
+    def _header(self, pos: int) -> tuple[int, int] | None:
+        """Return the header and value length of the item at pos, if complete."""
+        buffer = self._buffer
+        if pos + 2 > len(buffer):
+            return None
+        if buffer[pos + 1] != _EXTENDED_LENGTH:
+            return 2, buffer[pos + 1]
+        if pos + 4 > len(buffer):
+            return None
+        return 4, int.from_bytes(buffer[pos + 2 : pos + 4], "big")
+
+    def feed(self, chunk: bytes | bytearray | memoryview) -> list[MeshcopTLVItem]:
+        """Feed a chunk of data and return the items completed by it.
+
+        Raises if an item is invalid. The invalid item is dropped, items completed
+        before it are returned by the next call to feed or close.
+        """
+        buffer = self._buffer
+        buffer += chunk
+        items = self._items
+        pos = 0
+        length = len(buffer)
+
+        try:
+            while (header := self._header(pos)) is not None:
+                header_len, value_len = header
+                end = pos + header_len + value_len
+                if end > length:
+                    break
+                raw_tag = buffer[pos]
+                tag = _TAG_TYPES[raw_tag]
+                val = bytes(buffer[pos + header_len : end])
+                pos = end
+                if not isinstance(tag, MeshcopTLVType):
+                    _LOGGER.warning("unknown TLV type %d=%r", raw_tag, val)
+                items.append(_DECODERS[raw_tag](tag, val))
+        finally:
+            del buffer[:pos]
+
+        self._items = []
+        return items
+
+    def close(self) -> list[MeshcopTLVItem]:
+        """Signal the end of the input.
+
+        Returns the items which were not returned by feed because of an invalid
+        item. Raises if the input ended in the middle of an item.
+        """
+        items = self.feed(b"")
+        buffer = self._buffer
+        if not buffer:
+            return items
+        header = self._header(0)
+        self._buffer = bytearray()
+        if header is None:
+            raise TLVError("truncated tlv header")
+        header_len, value_len = header
+        raise TLVError(
+            f"expected {value_len} bytes for tag {_TAG_TYPES[buffer[0]]!r}, "
+            f"got {len(buffer) - header_len}"
+        )
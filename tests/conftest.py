@@ -1,10 +1,11 @@
 """Test fixtures."""
 
-from collections.abc import Generator
+from collections.abc import AsyncGenerator, Generator
 
 import pytest
 
 from tests.test_util.aiohttp import AiohttpClientMocker, mock_aiohttp_client
+from tests.test_util.server import OTBRServer
 
 
 @pytest.fixture
@@ -12,3 +13,12 @@ def aioclient_mock() -> Generator[AiohttpClientMocker, None, None]:
     """Fixture to mock aioclient calls."""
     with mock_aiohttp_client() as mock_session:
         yield mock_session
+
+
+@pytest.fixture
+async def otbr_server() -> AsyncGenerator[OTBRServer, None]:
+    """Fixture to serve a stand-in OTBR REST API on localhost."""
+    server = OTBRServer()
+    await server.start()
+    yield server
+    await server.stop()
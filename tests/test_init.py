@@ -1,13 +1,24 @@
 """Tests for version detection and the camelCase wire format."""
 
+import asyncio
 from http import HTTPStatus
+import json
+from pathlib import Path
 from typing import Any
 
+import aiohttp
 import pytest
+from yarl import URL
 import python_otbr_api
-from python_otbr_api import KeyFormat
+from python_otbr_api import (
+    _PASCAL_TO_CAMEL,
+    KeyFormat,
+    KeyFormatCache,
+    _rewrite_keys,
+)
 
-from tests.test_util.aiohttp import AiohttpClientMocker
+from tests.test_util.aiohttp import AiohttpClientMocker, AiohttpClientMockResponse
+from tests.test_util.server import BORDER_AGENT_ID, OTBRServer
 
 BASE_URL = "http://core-openthread-border-router:8081"
 
@@ -102,6 +113,95 @@ async def test_auto_detect_runs_once(aioclient_mock: AiohttpClientMocker) -> Non
     assert aioclient_mock.call_count == 3
 
 
+async def test_auto_detect_concurrent(aioclient_mock: AiohttpClientMocker) -> None:
+    """Concurrent first calls share a single probe."""
+    otbr = python_otbr_api.OTBR(BASE_URL, aioclient_mock.create_session())
+
+    async def slow_probe(
+        method: str, url: URL, _data: Any
+    ) -> AiohttpClientMockResponse:
+        await asyncio.sleep(0.01)
+        return AiohttpClientMockResponse(
+            method=method, url=url, status=HTTPStatus.OK, json={"data": []}
+        )
+
+    aioclient_mock.get(f"{BASE_URL}/api/actions", side_effect=slow_probe)
+    aioclient_mock.delete(f"{BASE_URL}/node", status=HTTPStatus.OK)
+
+    await asyncio.gather(*(otbr.factory_reset() for _ in range(100)))
+
+    probes = [call for call in aioclient_mock.mock_calls if call[0].lower() == "get"]
+    assert len(probes) == 1
+    assert aioclient_mock.call_count == 101
+
+
+async def test_auto_detect_concurrent_server(otbr_server: OTBRServer) -> None:
+    """Concurrent first calls to a real server share a single probe."""
+    async with python_otbr_api.OTBR.create(otbr_server.url) as otbr:
+        results = await asyncio.gather(
+            *(otbr.factory_reset() for _ in range(100)), return_exceptions=True
+        )
+
+    assert all(
+        isinstance(result, python_otbr_api.FactoryResetNotSupportedError)
+        for result in results
+    )
+    assert otbr_server.paths == {"/api/actions": 1, "/node": 100}
+
+
+async def test_auto_detect_concurrent_failure_retried(
+    aioclient_mock: AiohttpClientMocker,
+) -> None:
+    """A failed probe fails all waiting callers and isn't cached."""
+    otbr = python_otbr_api.OTBR(BASE_URL, aioclient_mock.create_session())
+    statuses = [HTTPStatus.INTERNAL_SERVER_ERROR, HTTPStatus.OK]
+
+    async def probe(method: str, url: URL, _data: Any) -> AiohttpClientMockResponse:
+        await asyncio.sleep(0.01)
+        return AiohttpClientMockResponse(
+            method=method, url=url, status=statuses.pop(0), json={"data": []}
+        )
+
+    aioclient_mock.get(f"{BASE_URL}/api/actions", side_effect=probe)
+    aioclient_mock.delete(f"{BASE_URL}/node", status=HTTPStatus.OK)
+
+    results = await asyncio.gather(
+        *(otbr.factory_reset() for _ in range(10)), return_exceptions=True
+    )
+    assert all(isinstance(result, python_otbr_api.OTBRError) for result in results)
+    assert aioclient_mock.call_count == 1
+
+    await otbr.factory_reset()
+    assert aioclient_mock.call_count == 3
+
+
+async def test_auto_detect_cancelled_caller(
+    aioclient_mock: AiohttpClientMocker,
+) -> None:
+    """Cancelling one caller doesn't cancel the shared probe."""
+    otbr = python_otbr_api.OTBR(BASE_URL, aioclient_mock.create_session())
+
+    async def slow_probe(
+        method: str, url: URL, _data: Any
+    ) -> AiohttpClientMockResponse:
+        await asyncio.sleep(0.01)
+        return AiohttpClientMockResponse(
+            method=method, url=url, status=HTTPStatus.OK, json={"data": []}
+        )
+
+    aioclient_mock.get(f"{BASE_URL}/api/actions", side_effect=slow_probe)
+    aioclient_mock.delete(f"{BASE_URL}/node", status=HTTPStatus.OK)
+
+    first = asyncio.create_task(otbr.factory_reset())
+    second = asyncio.create_task(otbr.factory_reset())
+    await asyncio.sleep(0)
+    first.cancel()
+    await second
+
+    assert first.cancelled()
+    assert aioclient_mock.call_count == 2
+
+
 async def test_constructor_key_format_skips_detection(
     aioclient_mock: AiohttpClientMocker,
 ) -> None:
@@ -157,6 +257,46 @@ async def test_camel_read_with_pascal_straggler(
     assert dataset.as_json() == DATASET_JSON_CAMEL
 
 
+def test_rewrite_keys_no_copy() -> None:
+    """Data without keys to rename is returned as is, nested dicts included."""
+    assert _rewrite_keys(DATASET_JSON_CAMEL, _PASCAL_TO_CAMEL) is DATASET_JSON_CAMEL
+
+    straggler = {
+        **DATASET_JSON_CAMEL,
+        "securityPolicy": {"Routers": True, "rotationTime": 672},
+    }
+    rewritten = _rewrite_keys(straggler, _PASCAL_TO_CAMEL)
+    assert rewritten is not straggler
+    assert rewritten["securityPolicy"] == {"routers": True, "rotationTime": 672}
+    assert rewritten["activeTimestamp"] is DATASET_JSON_CAMEL["activeTimestamp"]
+    assert straggler["securityPolicy"] == {"Routers": True, "rotationTime": 672}
+
+
+def test_rewrite_keys_once() -> None:
+    """Each nested dict is rewritten once."""
+
+    class CountingMapping(dict[str, str]):
+        """Mapping which counts lookups."""
+
+        def __init__(self, mapping: dict[str, str]) -> None:
+            """Initialize."""
+            super().__init__(mapping)
+            self.lookups: list[str] = []
+
+        def get(self, key: str, default: Any = None) -> Any:
+            """Record the lookup."""
+            self.lookups.append(key)
+            return super().get(key, default)
+
+    mapping = CountingMapping(_PASCAL_TO_CAMEL)
+    data = {"activeDataset": {"securityPolicy": {"Routers": True}}, "delay": 1}
+    assert _rewrite_keys(data, mapping) == {
+        "activeDataset": {"securityPolicy": {"routers": True}},
+        "delay": 1,
+    }
+    assert mapping.lookups == ["Routers"]
+
+
 async def test_create_active_dataset_camel_wire(
     aioclient_mock: AiohttpClientMocker,
 ) -> None:
@@ -174,3 +314,247 @@ async def test_create_active_dataset_camel_wire(
         "networkName": "OpenThread HA",
         "channel": 15,
     }
+
+
+async def test_key_format_cache_shared(aioclient_mock: AiohttpClientMocker) -> None:
+    """A shared key format cache makes detection run once per router."""
+    cache = KeyFormatCache()
+    aioclient_mock.get(
+        f"{BASE_URL}/api/actions", status=HTTPStatus.OK, json={"data": []}
+    )
+    aioclient_mock.delete(f"{BASE_URL}/node", status=HTTPStatus.OK)
+
+    for _ in range(3):
+        otbr = python_otbr_api.OTBR(
+            BASE_URL, aioclient_mock.create_session(), key_format_cache=cache
+        )
+        await otbr.factory_reset()
+
+    # 1 probe + 3 factory_reset calls
+    assert aioclient_mock.call_count == 4
+    assert cache.get(BASE_URL) == KeyFormat.CAMEL_CASE
+
+
+async def test_key_format_cache_on_disk(
+    aioclient_mock: AiohttpClientMocker, tmp_path: Path
+) -> None:
+    """The key format cache survives restarts when stored on disk."""
+    path = tmp_path / "key_formats.json"
+    aioclient_mock.get(f"{BASE_URL}/api/actions", status=HTTPStatus.NOT_FOUND)
+    aioclient_mock.delete(f"{BASE_URL}/node", status=HTTPStatus.OK)
+
+    otbr = python_otbr_api.OTBR(
+        BASE_URL, aioclient_mock.create_session(), key_format_cache=KeyFormatCache(path)
+    )
+    await otbr.factory_reset()
+    assert json.loads(path.read_text(encoding="utf-8")) == {BASE_URL: "pascal"}
+
+    otbr = python_otbr_api.OTBR(
+        BASE_URL, aioclient_mock.create_session(), key_format_cache=KeyFormatCache(path)
+    )
+    await otbr.factory_reset()
+    # 1 probe + 2 factory_reset calls
+    assert aioclient_mock.call_count == 3
+
+
+@pytest.mark.parametrize("content", ("not json", '{"url": "kebab"}', "[]"))
+def test_key_format_cache_invalid_file(tmp_path: Path, content: str) -> None:
+    """An invalid key format cache file is ignored."""
+    path = tmp_path / "key_formats.json"
+    path.write_text(content, encoding="utf-8")
+    cache = KeyFormatCache(path)
+    cache.load()
+    assert cache.get(BASE_URL) is None
+    cache.set(BASE_URL, KeyFormat.CAMEL_CASE)
+    cache.save()
+    assert json.loads(path.read_text(encoding="utf-8")) == {BASE_URL: "camel"}
+
+
+def test_key_format_cache_load_save(tmp_path: Path) -> None:
+    """The key format cache file is replaced, formats set before loading win."""
+    path = tmp_path / "key_formats.json"
+    path.write_text(
+        json.dumps({BASE_URL: "pascal", "http://other:8081": "pascal"}),
+        encoding="utf-8",
+    )
+    cache = KeyFormatCache(path)
+    assert cache.set(BASE_URL, KeyFormat.CAMEL_CASE)
+    assert not cache.set(BASE_URL, KeyFormat.CAMEL_CASE)
+    cache.load()
+    assert cache.get(BASE_URL) == KeyFormat.CAMEL_CASE
+    assert cache.get("http://other:8081") == KeyFormat.PASCAL_CASE
+
+    assert cache.invalidate("http://other:8081")
+    assert not cache.invalidate("http://other:8081")
+    cache.save()
+    assert json.loads(path.read_text(encoding="utf-8")) == {BASE_URL: "camel"}
+    # Written through a temporary file which was renamed over the old one
+    assert [file.name for file in tmp_path.iterdir()] == ["key_formats.json"]
+
+
+def test_key_format_cache_save_error(
+    tmp_path: Path, caplog: pytest.LogCaptureFixture
+) -> None:
+    """A key format cache which can't be stored is kept in memory."""
+    cache = KeyFormatCache(tmp_path / "missing" / "key_formats.json")
+    cache.set(BASE_URL, KeyFormat.CAMEL_CASE)
+    cache.save()
+    assert "Could not store key format cache" in caplog.text
+    assert cache.get(BASE_URL) == KeyFormat.CAMEL_CASE
+    assert not list(tmp_path.iterdir())
+
+
+async def test_key_format_cache_upgraded_router(
+    aioclient_mock: AiohttpClientMocker,
+) -> None:
+    """A camelCase response from a cached PascalCase router updates the cache."""
+    cache = KeyFormatCache()
+    cache.set(BASE_URL, KeyFormat.PASCAL_CASE)
+    otbr = python_otbr_api.OTBR(
+        BASE_URL, aioclient_mock.create_session(), key_format_cache=cache
+    )
+
+    aioclient_mock.get(f"{BASE_URL}/node/dataset/active", json=DATASET_JSON_CAMEL)
+    aioclient_mock.put(f"{BASE_URL}/node/dataset/active", status=HTTPStatus.CREATED)
+
+    dataset = await otbr.get_active_dataset()
+    assert dataset is not None
+    assert cache.get(BASE_URL) == KeyFormat.CAMEL_CASE
+
+    await otbr.create_active_dataset(
+        python_otbr_api.ActiveDataSet(network_name="OpenThread HA", channel=15)
+    )
+    assert aioclient_mock.mock_calls[-1][2] == {
+        "networkName": "OpenThread HA",
+        "channel": 15,
+    }
+
+
+async def test_key_format_cache_bad_request(
+    aioclient_mock: AiohttpClientMocker,
+) -> None:
+    """A rejected dataset body makes the key format be detected again."""
+    cache = KeyFormatCache()
+    cache.set(BASE_URL, KeyFormat.PASCAL_CASE)
+    otbr = python_otbr_api.OTBR(
+        BASE_URL, aioclient_mock.create_session(), key_format_cache=cache
+    )
+
+    aioclient_mock.put(
+        f"{BASE_URL}/node/dataset/pending", status=HTTPStatus.BAD_REQUEST
+    )
+    aioclient_mock.get(
+        f"{BASE_URL}/api/actions", status=HTTPStatus.OK, json={"data": []}
+    )
+
+    with pytest.raises(python_otbr_api.OTBRError):
+        await otbr.create_pending_dataset(python_otbr_api.PendingDataSet(delay=1))
+    assert cache.get(BASE_URL) is None
+    assert aioclient_mock.call_count == 1
+
+    with pytest.raises(python_otbr_api.OTBRError):
+        await otbr.create_pending_dataset(python_otbr_api.PendingDataSet(delay=1))
+    # The second attempt probed the format again and sent a camelCase body
+    assert aioclient_mock.call_count == 3
+    assert aioclient_mock.mock_calls[-1][2] == {"delay": 1}
+
+
+async def test_create_reuses_connections(otbr_server: OTBRServer) -> None:
+    """An OTBR from create() keeps connections alive and limits them per host."""
+    async with python_otbr_api.OTBR.create(otbr_server.url) as otbr:
+        for _ in range(20):
+            assert await otbr.get_border_agent_id() == bytes.fromhex(BORDER_AGENT_ID)
+        assert len(otbr_server.peers) == 1
+
+        await asyncio.gather(*(otbr.get_border_agent_id() for _ in range(20)))
+        assert len(otbr_server.peers) <= 4
+
+    # 1 probe + 40 calls
+    assert otbr_server.requests == 41
+
+
+async def test_create_closes_session(otbr_server: OTBRServer) -> None:
+    """The session of an OTBR from create() is closed when leaving the context."""
+    async with python_otbr_api.OTBR.create(otbr_server.url) as otbr:
+        await otbr.get_border_agent_id()
+    with pytest.raises(RuntimeError, match="Session is closed"):
+        await otbr.get_border_agent_id()
+
+    otbr = python_otbr_api.OTBR.create(otbr_server.url)
+    await otbr.close()
+    with pytest.raises(RuntimeError, match="Session is closed"):
+        await otbr.get_border_agent_id()
+
+
+async def test_close_keeps_passed_session(otbr_server: OTBRServer) -> None:
+    """A session passed to OTBR isn't closed by it."""
+    async with aiohttp.ClientSession() as session:
+        async with python_otbr_api.OTBR(otbr_server.url, session) as otbr:
+            await otbr.get_border_agent_id()
+        assert not session.closed
+        await otbr.get_border_agent_id()
+
+
+async def test_responses_released(otbr_server: OTBRServer) -> None:
+    """Responses are released on success and error, so connections are reused."""
+    async with aiohttp.ClientSession() as session:
+        otbr = python_otbr_api.OTBR(otbr_server.url, session)
+        semaphore = asyncio.Semaphore(4)
+
+        async def call(index: int) -> None:
+            async with semaphore:
+                if index % 3 == 0:
+                    await otbr.get_border_agent_id()
+                elif index % 3 == 1:
+                    with pytest.raises(python_otbr_api.FactoryResetNotSupportedError):
+                        await otbr.factory_reset()
+                else:
+                    with pytest.raises(python_otbr_api.OTBRError):
+                        await otbr.get_active_dataset()
+
+        await asyncio.gather(*(call(index) for index in range(10000)))
+
+    # 1 probe + 10k calls, over no more connections than concurrent calls
+    assert otbr_server.requests == 10001
+    assert len(otbr_server.peers) <= 4
+
+
+@pytest.mark.parametrize("key_format", tuple(KeyFormat))
+async def test_explicit_key_format_kept(
+    aioclient_mock: AiohttpClientMocker, key_format: KeyFormat
+) -> None:
+    """A key format passed by the caller isn't changed by responses."""
+    cache = KeyFormatCache()
+    otbr = python_otbr_api.OTBR(
+        BASE_URL,
+        aioclient_mock.create_session(),
+        key_format=key_format,
+        key_format_cache=cache,
+    )
+
+    aioclient_mock.get(
+        f"{BASE_URL}/node/dataset/active",
+        json=(
+            {"NetworkName": "OpenThread HA", "Channel": 15}
+            if key_format == KeyFormat.CAMEL_CASE
+            else {"networkName": "OpenThread HA", "channel": 15}
+        ),
+    )
+    aioclient_mock.put(
+        f"{BASE_URL}/node/dataset/pending", status=HTTPStatus.BAD_REQUEST
+    )
+
+    assert await otbr.get_active_dataset() is not None
+    for _ in range(2):
+        with pytest.raises(python_otbr_api.OTBRError):
+            await otbr.create_pending_dataset(python_otbr_api.PendingDataSet(delay=1))
+
+    # No probe, and the bodies were sent in the passed format
+    assert [call[1].path for call in aioclient_mock.mock_calls] == [
+        "/node/dataset/active",
+        "/node/dataset/pending",
+        "/node/dataset/pending",
+    ]
+    expected = {"delay": 1} if key_format == KeyFormat.CAMEL_CASE else {"Delay": 1}
+    assert aioclient_mock.mock_calls[-1][2] == expected
+    assert cache.get(BASE_URL) is None
@@ -1,6 +1,26 @@
 """Test data models."""
 
+import gc
+from typing import Any
+from unittest.mock import patch
+
+import pytest
+import voluptuous as vol  # type: ignore[import]
+
 import python_otbr_api
+from python_otbr_api.models import DataSetInternTable, SecurityPolicy, diff
+from python_otbr_api.tlv_parser import (
+    Channel,
+    Integer,
+    MeshcopTLVItem,
+    MeshcopTLVType,
+    SecurityPolicy as TLVSecurityPolicy,
+    Timestamp as TLVTimestamp,
+    TLVError,
+    parse_tlv_bytes,
+    register_decoder,
+)
+from tests.test_tlv_parser import DATASET_HEX
 
 ACTIVE_DATASET_CAMEL = {
     "activeTimestamp": {"seconds": 1, "ticks": 0, "authoritative": False},
@@ -48,3 +68,388 @@ def test_pending_dataset_from_json():
         python_otbr_api.Timestamp(),
     )
     assert result.as_json() == PENDING_CAMEL
+
+
+@pytest.mark.parametrize(
+    ("model", "json_data", "error"),
+    (
+        (python_otbr_api.ActiveDataSet, None, "expected a dictionary"),
+        (python_otbr_api.ActiveDataSet, [], "expected a dictionary"),
+        (
+            python_otbr_api.ActiveDataSet,
+            {"channel": "15"},
+            "expected int for dictionary value @ data['channel']",
+        ),
+        (
+            python_otbr_api.ActiveDataSet,
+            {"channel": None},
+            "expected int for dictionary value @ data['channel']",
+        ),
+        (
+            python_otbr_api.ActiveDataSet,
+            {"networkName": b"OpenThread"},
+            "expected str for dictionary value @ data['networkName']",
+        ),
+        (
+            python_otbr_api.ActiveDataSet,
+            {"unknown": 1},
+            "extra keys not allowed @ data['unknown']",
+        ),
+        (
+            python_otbr_api.ActiveDataSet,
+            {"activeTimestamp": []},
+            "expected dict for dictionary value @ data['activeTimestamp']",
+        ),
+        (
+            python_otbr_api.ActiveDataSet,
+            {"activeTimestamp": {"seconds": "1"}},
+            "expected int for dictionary value @ data['seconds']",
+        ),
+        (
+            python_otbr_api.ActiveDataSet,
+            {"securityPolicy": {"routers": 1}},
+            "expected bool for dictionary value @ data['routers']",
+        ),
+        (
+            python_otbr_api.PendingDataSet,
+            {"delay": "1"},
+            "expected int for dictionary value @ data['delay']",
+        ),
+        (
+            python_otbr_api.PendingDataSet,
+            {"pendingTimestamp": {"Ticks": 0}},
+            "extra keys not allowed @ data['Ticks']",
+        ),
+    ),
+)
+def test_from_json_invalid(model: Any, json_data: Any, error: str) -> None:
+    """Test deserializing invalid JSON raises the schema's error."""
+    with pytest.raises(vol.Invalid) as err:
+        model.from_json(json_data)
+    assert str(err.value) == error
+
+
+def test_from_json_skips_schema() -> None:
+    """Test valid JSON is deserialized without running the voluptuous schemas."""
+    data = {
+        **ACTIVE_DATASET_CAMEL,
+        "securityPolicy": {"routers": True, "rotationTime": 672},
+    }
+    with patch.object(vol.Schema, "__call__", side_effect=AssertionError):
+        dataset = python_otbr_api.ActiveDataSet.from_json(data)
+        pending = python_otbr_api.PendingDataSet.from_json(PENDING_CAMEL)
+    assert dataset.as_json() == data
+    assert pending.as_json() == PENDING_CAMEL
+
+
+DATASET_TLV = bytes.fromhex(DATASET_HEX)
+
+DATASET_FROM_TLV = python_otbr_api.ActiveDataSet(
+    active_timestamp=python_otbr_api.Timestamp(False, 1, 0),
+    channel_mask=134215680,
+    channel=15,
+    extended_pan_id="1111111122222222",
+    mesh_local_prefix="fdad:70bf:e5aa:15dd::/64",
+    network_key="00112233445566778899AABBCCDDEEFF",
+    network_name="OpenThreadDemo",
+    pan_id=0x1234,
+    psk_c="445F2B5CA6F2A93A55CE570A70EFEECB",
+    security_policy=SecurityPolicy(
+        autonomous_enrollment=False,
+        commercial_commissioning=False,
+        external_commissioning=True,
+        native_commissioning=True,
+        network_key_provisioning=False,
+        non_ccm_routers=False,
+        obtain_network_key=True,
+        rotation_time=672,
+        routers=True,
+        to_ble_link=True,
+    ),
+)
+
+
+def test_active_dataset_tlv():
+    """Test converting an ActiveDataSet from and to TLV."""
+    dataset = python_otbr_api.ActiveDataSet.from_tlv(DATASET_TLV)
+    assert dataset == DATASET_FROM_TLV
+    assert dataset.to_tlv() == DATASET_TLV
+    assert python_otbr_api.ActiveDataSet().to_tlv() == b""
+
+    # Unset security policy flags get the Thread defaults
+    dataset = python_otbr_api.ActiveDataSet(security_policy=SecurityPolicy())
+    assert dataset.to_tlv() == bytes.fromhex("0C0402A0F7F8")
+
+
+def test_pending_dataset_tlv():
+    """Test converting a PendingDataSet from and to TLV."""
+    pending_tlv = DATASET_TLV + bytes.fromhex("3308000000000002000034040000EA60")
+    dataset = python_otbr_api.PendingDataSet.from_tlv(pending_tlv)
+    assert dataset == python_otbr_api.PendingDataSet(
+        DATASET_FROM_TLV, 60000, python_otbr_api.Timestamp(False, 2, 0)
+    )
+    assert dataset.to_tlv() == pending_tlv
+
+
+@pytest.mark.parametrize(
+    ("dataset", "msg"),
+    (
+        (python_otbr_api.ActiveDataSet(pan_id=0x12345), "invalid PAN ID 74565"),
+        (python_otbr_api.ActiveDataSet(channel=-1), "invalid channel -1"),
+        (python_otbr_api.ActiveDataSet(channel=0x10000), "invalid channel 65536"),
+        (
+            python_otbr_api.ActiveDataSet(channel_mask=2**32),
+            "invalid channel mask 4294967296",
+        ),
+        (
+            python_otbr_api.ActiveDataSet(network_name="a" * 300),
+            "value of tag <MeshcopTLVType.NETWORKNAME: 3> too long: 300 bytes",
+        ),
+        (python_otbr_api.ActiveDataSet(network_key="xyz"), "non-hexadecimal"),
+        (
+            python_otbr_api.ActiveDataSet(
+                active_timestamp=python_otbr_api.Timestamp(seconds=2**48)
+            ),
+            "invalid timestamp seconds 281474976710656",
+        ),
+        (
+            python_otbr_api.ActiveDataSet(
+                active_timestamp=python_otbr_api.Timestamp(ticks=2**15)
+            ),
+            "invalid timestamp ticks 65536",
+        ),
+        (
+            python_otbr_api.ActiveDataSet(
+                security_policy=SecurityPolicy(rotation_time=-1)
+            ),
+            "invalid rotation time -1",
+        ),
+        (python_otbr_api.PendingDataSet(delay=2**33), "invalid delay 8589934592"),
+        (
+            python_otbr_api.PendingDataSet(python_otbr_api.ActiveDataSet(pan_id=-1)),
+            "invalid PAN ID -1",
+        ),
+    ),
+)
+def test_to_tlv_invalid(dataset: Any, msg: str) -> None:
+    """Test fields which can't be encoded to TLV raise ValueError."""
+    with pytest.raises(ValueError, match=msg):
+        dataset.to_tlv()
+
+
+def test_from_tlv_registered_decoder() -> None:
+    """Test decoding datasets when another decoder is registered for a tag."""
+    register_decoder(MeshcopTLVType.PANID, MeshcopTLVItem)
+    register_decoder(MeshcopTLVType.ACTIVETIMESTAMP, MeshcopTLVItem)
+    try:
+        dataset = python_otbr_api.ActiveDataSet.from_tlv(DATASET_TLV)
+        with pytest.raises(TLVError, match="invalid timestamp '00'"):
+            python_otbr_api.ActiveDataSet.from_tlv(bytes.fromhex("0E0100"))
+    finally:
+        register_decoder(MeshcopTLVType.PANID, Integer)
+        register_decoder(MeshcopTLVType.ACTIVETIMESTAMP, TLVTimestamp)
+    assert dataset == DATASET_FROM_TLV
+
+
+@pytest.mark.parametrize(
+    ("tlv", "msg"),
+    (
+        ("000302000b", "unsupported channel page 2"),
+        ("00020b00", "invalid channel '0b00'"),
+        ("00040000000b", "invalid channel '0000000b'"),
+    ),
+)
+def test_from_tlv_invalid_channel(tlv: str, msg: str) -> None:
+    """Test channels on other pages or of the wrong length are rejected."""
+    with pytest.raises(TLVError, match=msg):
+        python_otbr_api.ActiveDataSet.from_tlv(bytes.fromhex(tlv))
+
+
+def test_from_tlv_channel_round_trip() -> None:
+    """Test the channel survives a round trip through TLV."""
+    dataset = python_otbr_api.ActiveDataSet.from_tlv(bytes.fromhex("00030001a1"))
+    assert dataset.channel == 0x1A1
+    assert dataset.to_tlv() == bytes.fromhex("00030001a1")
+
+
+def test_from_tlv_subclass() -> None:
+    """Test from_tlv returns an instance of the class it's called on."""
+
+    class CustomDataSet(python_otbr_api.ActiveDataSet):
+        """Active dataset subclass."""
+
+    dataset = CustomDataSet.from_tlv(DATASET_TLV)
+    assert isinstance(dataset, CustomDataSet)
+    assert dataset.channel == DATASET_FROM_TLV.channel
+
+
+def test_models_slots() -> None:
+    """Test the models don't keep a per-instance __dict__."""
+    dataset = python_otbr_api.PendingDataSet.from_json(
+        {**PENDING_CAMEL, "activeDataset": ACTIVE_DATASET_CAMEL}
+    )
+    active_dataset = dataset.active_dataset
+    assert active_dataset is not None
+    for model in (
+        dataset,
+        active_dataset,
+        dataset.pending_timestamp,
+        active_dataset.active_timestamp,
+        active_dataset.security_policy,
+    ):
+        assert not hasattr(model, "__dict__")
+
+
+def test_replace() -> None:
+    """Test replacing fields returns an updated copy."""
+    dataset = python_otbr_api.ActiveDataSet.from_json(ACTIVE_DATASET_CAMEL)
+    updated = dataset.replace(channel=20, pan_id=1)
+    assert updated.channel == 20
+    assert updated.pan_id == 1
+    assert updated.network_name == dataset.network_name
+    assert updated.security_policy is dataset.security_policy
+    assert dataset.as_json() == ACTIVE_DATASET_CAMEL
+
+    timestamp = python_otbr_api.Timestamp(False, 1, 0)
+    assert timestamp.replace(seconds=2) == python_otbr_api.Timestamp(False, 2, 0)
+    assert SecurityPolicy(routers=True).replace(routers=False) == SecurityPolicy(
+        routers=False
+    )
+    assert python_otbr_api.PendingDataSet(delay=1).replace(
+        delay=2
+    ) == python_otbr_api.PendingDataSet(delay=2)
+
+
+def test_content_hash() -> None:
+    """Test the content hash of datasets."""
+    dataset = python_otbr_api.ActiveDataSet.from_json(ACTIVE_DATASET_CAMEL)
+    content_hash = dataset.content_hash()
+    assert content_hash.hex() == "4ab48a928ca6ea19ba7908ecdce96f58"
+    assert (
+        python_otbr_api.ActiveDataSet.from_json(
+            dict(reversed(ACTIVE_DATASET_CAMEL.items()))
+        ).content_hash()
+        == content_hash
+    )
+    assert dataset.replace(channel=16).content_hash() != content_hash
+
+    pending = python_otbr_api.PendingDataSet(dataset, 30000)
+    assert pending.content_hash() not in (
+        content_hash,
+        pending.replace(delay=0).content_hash(),
+    )
+    assert python_otbr_api.PendingDataSet().content_hash() != (
+        python_otbr_api.ActiveDataSet().content_hash()
+    )
+
+
+def test_intern_table() -> None:
+    """Test equal datasets are interned to one object."""
+    table = DataSetInternTable()
+    dataset = table.intern(
+        python_otbr_api.ActiveDataSet.from_json(ACTIVE_DATASET_CAMEL)
+    )
+    assert (
+        table.intern(python_otbr_api.ActiveDataSet.from_json(ACTIVE_DATASET_CAMEL))
+        is dataset
+    )
+
+    other = dataset.replace(channel=16)
+    assert table.intern(other) is other
+    pending = table.intern(python_otbr_api.PendingDataSet(dataset))
+    assert table.intern(python_otbr_api.PendingDataSet(dataset)) is pending
+    assert len(table) == 3
+
+    del dataset, other, pending
+    gc.collect()
+    assert len(table) == 0
+
+
+def test_diff() -> None:
+    """Test diffing datasets."""
+    old = python_otbr_api.ActiveDataSet.from_json(ACTIVE_DATASET_CAMEL)
+    assert not diff(old, old.replace())
+
+    new = old.replace(
+        channel=20,
+        active_timestamp=python_otbr_api.Timestamp(False, 2, 0),
+        security_policy=SecurityPolicy(rotation_time=672, routers=False),
+        network_key=None,
+    )
+    assert diff(old, new) == {
+        "active_timestamp.seconds": (1, 2),
+        "channel": (15, 20),
+        "network_key": ("00112233445566778899aabbccddeeff", None),
+        "security_policy.obtain_network_key": (True, None),
+        "security_policy.routers": (True, False),
+    }
+    assert diff(old, old.replace(security_policy=None)) == {
+        "security_policy": (old.security_policy, None)
+    }
+
+    pending = python_otbr_api.PendingDataSet(old, 30000)
+    assert diff(pending, pending.replace(active_dataset=new, delay=0)) == {
+        "active_dataset.active_timestamp.seconds": (1, 2),
+        "active_dataset.channel": (15, 20),
+        "active_dataset.network_key": ("00112233445566778899aabbccddeeff", None),
+        "active_dataset.security_policy.obtain_network_key": (True, None),
+        "active_dataset.security_policy.routers": (True, False),
+        "delay": (30000, 0),
+    }
+
+
+def test_diff_tlv() -> None:
+    """Test diffing parsed TLV datasets."""
+    old = parse_tlv_bytes(DATASET_TLV)
+    assert not diff(old, parse_tlv_bytes(DATASET_TLV))
+
+    new = dict(old)
+    new[MeshcopTLVType.CHANNEL] = Channel(
+        MeshcopTLVType.CHANNEL, bytes.fromhex("000014")
+    )
+    # Routers bit cleared
+    new[MeshcopTLVType.SECURITYPOLICY] = TLVSecurityPolicy(
+        MeshcopTLVType.SECURITYPOLICY, bytes.fromhex("02a0d7f8")
+    )
+    new[MeshcopTLVType.ACTIVETIMESTAMP] = TLVTimestamp(
+        MeshcopTLVType.ACTIVETIMESTAMP, bytes.fromhex("0000000000020000")
+    )
+    del new[MeshcopTLVType.PSKC]
+    new[MeshcopTLVType.DELAYTIMER] = old[MeshcopTLVType.PANID]
+    network_key = MeshcopTLVItem(MeshcopTLVType.NETWORKKEY, bytes(16))
+    new[MeshcopTLVType.NETWORKKEY] = network_key
+    assert diff(old, new) == {
+        "ACTIVETIMESTAMP.seconds": (1, 2),
+        "CHANNEL.channel": (15, 20),
+        "SECURITYPOLICY.routers": (True, False),
+        MeshcopTLVType.NETWORKKEY: (old[MeshcopTLVType.NETWORKKEY], network_key),
+        MeshcopTLVType.PSKC: (old[MeshcopTLVType.PSKC], None),
+        MeshcopTLVType.DELAYTIMER: (None, old[MeshcopTLVType.PANID]),
+    }
+
+    # Items with the same decoded fields, or of different types, are reported whole
+    policy = old[MeshcopTLVType.SECURITYPOLICY]
+    reserved_bit = TLVSecurityPolicy(
+        MeshcopTLVType.SECURITYPOLICY, bytes.fromhex("02a0fff8")
+    )
+    undecoded = MeshcopTLVItem(MeshcopTLVType.SECURITYPOLICY, bytes.fromhex("02a0"))
+    for new_policy in (reserved_bit, undecoded):
+        assert diff(
+            {MeshcopTLVType.SECURITYPOLICY: policy},
+            {MeshcopTLVType.SECURITYPOLICY: new_policy},
+        ) == {MeshcopTLVType.SECURITYPOLICY: (policy, new_policy)}
+
+
+@pytest.mark.parametrize(
+    ("old", "new"),
+    (
+        (python_otbr_api.ActiveDataSet(), python_otbr_api.PendingDataSet()),
+        (python_otbr_api.ActiveDataSet(), {}),
+        ({}, python_otbr_api.PendingDataSet()),
+        (python_otbr_api.Timestamp(), python_otbr_api.Timestamp()),
+    ),
+)
+def test_diff_mismatched(old: Any, new: Any) -> None:
+    """Test diffing datasets of different types raises."""
+    with pytest.raises(TypeError, match="can't diff"):
+        diff(old, new)
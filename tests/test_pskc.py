@@ -1,36 +1,238 @@
 """Test calculating PSKc."""
 
+import asyncio
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import threading
+from unittest.mock import patch
+
 import pytest
 
-from python_otbr_api.pskc import compute_pskc
+from python_otbr_api import ActiveDataSet, pskc
+from python_otbr_api.pskc import (
+    PSKcCache,
+    async_compute_pskc,
+    async_verify_pskc,
+    compute_pskc,
+    compute_pskc_many,
+    verify_pskc,
+)
+from python_otbr_api.tlv_parser import LazyDataset, parse_tlv
+
+TEST_VECTORS = [
+    # Example from https://openthread.io/guides/border-router/tools#pskc_generator
+    (
+        bytes.fromhex("1234AAAA1234BBBB"),
+        "MyOTBRNetwork",
+        "J01NME",
+        "ee4fb64e9341e13846bbe7e1c52b6785",
+    ),
+    # OTBR Web UI default
+    (
+        bytes.fromhex("1111111122222222"),
+        "OpenThreadDemo",
+        "j01Nme",
+        "445f2b5ca6f2a93a55ce570a70efeecb",
+    ),
+    # 128 bit key
+    (
+        bytes.fromhex("1234AAAA1234BBBB"),
+        "MyOTBRNetwork",
+        "0123456789ABCDEF",
+        "f1927f0ec11da1ac7ef4ee05e81fe0ce",
+    ),
+]
 
 
 @pytest.mark.parametrize(
-    "ext_pan_id, network_name, passphrase, expected_pskc",
-    [
-        # Example from https://openthread.io/guides/border-router/tools#pskc_generator
-        (
-            bytes.fromhex("1234AAAA1234BBBB"),
-            "MyOTBRNetwork",
-            "J01NME",
-            "ee4fb64e9341e13846bbe7e1c52b6785",
-        ),
-        # OTBR Web UI default
-        (
-            bytes.fromhex("1111111122222222"),
-            "OpenThreadDemo",
-            "j01Nme",
-            "445f2b5ca6f2a93a55ce570a70efeecb",
-        ),
-        # 128 bit key
-        (
-            bytes.fromhex("1234AAAA1234BBBB"),
-            "MyOTBRNetwork",
-            "0123456789ABCDEF",
-            "f1927f0ec11da1ac7ef4ee05e81fe0ce",
-        ),
-    ],
+    "ext_pan_id, network_name, passphrase, expected_pskc", TEST_VECTORS
 )
 def test_compute_pskc(ext_pan_id, network_name, passphrase, expected_pskc) -> None:
     """Test the TLV parser."""
     assert expected_pskc == compute_pskc(ext_pan_id, network_name, passphrase).hex()
+
+
+def test_compute_pskc_many() -> None:
+    """Test computing a batch of PSKc."""
+    inputs = [vector[:3] for vector in TEST_VECTORS]
+    expected = [bytes.fromhex(vector[3]) for vector in TEST_VECTORS]
+
+    assert not compute_pskc_many([])
+    assert compute_pskc_many(inputs[:1]) == expected[:1]
+    assert compute_pskc_many(inputs) == expected
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert compute_pskc_many(iter(inputs), executor) == expected
+    with ThreadPoolExecutor() as executor:
+        assert compute_pskc_many(inputs, executor) == expected
+
+
+async def test_async_compute_pskc() -> None:
+    """Test concurrent identical calls share one computation."""
+    ext_pan_id, network_name, passphrase, expected_pskc = TEST_VECTORS[0]
+    calls = 0
+
+    def _compute_pskc(*args) -> bytes:
+        nonlocal calls
+        calls += 1
+        return compute_pskc(*args)
+
+    with patch("python_otbr_api.pskc.compute_pskc", _compute_pskc):
+        results = await asyncio.gather(
+            *(
+                async_compute_pskc(ext_pan_id, network_name, passphrase)
+                for _ in range(10)
+            ),
+            async_compute_pskc(*TEST_VECTORS[1][:3]),
+        )
+    assert [result.hex() for result in results] == [expected_pskc] * 10 + [
+        TEST_VECTORS[1][3]
+    ]
+    assert calls == 2
+    assert not pskc._PENDING  # pylint: disable=protected-access
+
+
+async def test_async_compute_pskc_cancel() -> None:
+    """Test cancelling a caller doesn't affect the other callers."""
+    ext_pan_id, network_name, passphrase, expected_pskc = TEST_VECTORS[0]
+    started = threading.Event()
+    release = threading.Event()
+
+    def _compute_pskc(*args) -> bytes:
+        started.set()
+        release.wait()
+        return compute_pskc(*args)
+
+    with (
+        ThreadPoolExecutor(max_workers=1) as executor,
+        patch("python_otbr_api.pskc.compute_pskc", _compute_pskc),
+    ):
+        task_1 = asyncio.create_task(
+            async_compute_pskc(ext_pan_id, network_name, passphrase, executor)
+        )
+        task_2 = asyncio.create_task(
+            async_compute_pskc(ext_pan_id, network_name, passphrase, executor)
+        )
+        await asyncio.get_running_loop().run_in_executor(None, started.wait)
+        task_1.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task_1
+        release.set()
+        assert (await task_2).hex() == expected_pskc
+
+        # A computation nobody waits for anymore is cancelled before it starts
+        release.clear()
+        started.clear()
+        blocker = asyncio.get_running_loop().run_in_executor(executor, release.wait)
+        task = asyncio.create_task(
+            async_compute_pskc(ext_pan_id, network_name, passphrase, executor)
+        )
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        release.set()
+        await blocker
+    assert not started.is_set()
+
+
+def test_pskc_cache() -> None:
+    """Test the PSKc cache."""
+    cache = PSKcCache(maxsize=2)
+    inputs = [vector[:3] for vector in TEST_VECTORS]
+    expected = [bytes.fromhex(vector[3]) for vector in TEST_VECTORS]
+
+    assert cache.compute(*inputs[0]) == expected[0]
+    assert cache.compute(*inputs[0]) == expected[0]
+    assert (cache.hits, cache.misses) == (1, 1)
+    assert cache.compute(*inputs[1]) == expected[1]
+    assert cache.compute(*inputs[0]) == expected[0]
+    assert (cache.hits, cache.misses) == (2, 2)
+
+    # The least recently used entry is evicted
+    cache.put(*inputs[2], expected[2])
+    assert len(cache) == 2
+    assert cache.get(*inputs[1]) is None
+    assert cache.get(*inputs[0]) == expected[0]
+    assert cache.get(*inputs[2]) == expected[2]
+
+    # The passphrases aren't kept
+    assert not any(
+        inputs[0][2].encode() in key
+        for key in cache._entries  # pylint: disable=protected-access
+    )
+
+    cache.clear()
+    assert len(cache) == 0
+
+
+def test_pskc_cache_ttl() -> None:
+    """Test entries of the PSKc cache expire."""
+    cache = PSKcCache(ttl=60)
+    ext_pan_id, network_name, passphrase, expected_pskc = TEST_VECTORS[0]
+
+    with patch("python_otbr_api.pskc.time.monotonic", return_value=1000):
+        cache.put(ext_pan_id, network_name, passphrase, bytes.fromhex(expected_pskc))
+    with patch("python_otbr_api.pskc.time.monotonic", return_value=1059):
+        assert cache.get(ext_pan_id, network_name, passphrase) is not None
+    with patch("python_otbr_api.pskc.time.monotonic", return_value=1060):
+        assert cache.get(ext_pan_id, network_name, passphrase) is None
+    assert len(cache) == 0
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+async def test_async_compute_pskc_cache() -> None:
+    """Test async PSKc computation with a cache."""
+    cache = PSKcCache()
+    ext_pan_id, network_name, passphrase, expected_pskc = TEST_VECTORS[0]
+
+    for _ in range(2):
+        pskc_value = await async_compute_pskc(
+            ext_pan_id, network_name, passphrase, cache=cache
+        )
+        assert pskc_value.hex() == expected_pskc
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+# OTBR Web UI default, the passphrase is j01Nme
+DATASET = ActiveDataSet(
+    extended_pan_id="1111111122222222",
+    network_name="OpenThreadDemo",
+    psk_c="445F2B5CA6F2A93A55CE570A70EFEECB",
+)
+DATASET_TLV = (
+    "02081111111122222222030E4F70656E54687265616444656D6F"
+    "0410445F2B5CA6F2A93A55CE570A70EFEECB"
+)
+
+
+@pytest.mark.parametrize(
+    "dataset",
+    (DATASET, parse_tlv(DATASET_TLV), LazyDataset.from_hex(DATASET_TLV)),
+)
+def test_verify_pskc(dataset) -> None:
+    """Test verifying the PSKc of a dataset."""
+    assert verify_pskc(dataset, "j01Nme") is True
+    assert verify_pskc(dataset, "J01NME") is False
+
+    cache = PSKcCache()
+    assert verify_pskc(dataset, "j01Nme", cache) is True
+    assert verify_pskc(dataset, "j01Nme", cache) is True
+    assert (cache.hits, cache.misses) == (1, 1)
+
+
+@pytest.mark.parametrize(
+    "dataset",
+    (
+        ActiveDataSet(extended_pan_id="1111111122222222", network_name="OpenThread"),
+        parse_tlv("02081111111122222222030E4F70656E54687265616444656D6F"),
+    ),
+)
+def test_verify_pskc_incomplete_dataset(dataset) -> None:
+    """Test verifying the PSKc of a dataset without PSKc."""
+    with pytest.raises(ValueError, match="dataset has no"):
+        verify_pskc(dataset, "j01Nme")
+
+
+async def test_async_verify_pskc() -> None:
+    """Test verifying the PSKc of a dataset without blocking the event loop."""
+    assert await async_verify_pskc(DATASET, "j01Nme") is True
+    assert await async_verify_pskc(DATASET, "J01NME") is False
@@ -1,51 +1,66 @@
 """Test the Thread TLV parser."""
 
+from concurrent.futures import ProcessPoolExecutor
+from unittest.mock import patch
+
 import pytest
 
 from python_otbr_api.tlv_parser import (
+    ChannelMask,
+    Integer,
+    IPv6Address,
+    LazyDataset,
+    MeshLocalPrefix,
+    SecurityPolicy,
+    State,
+    Text,
     Timestamp,
     Channel,
     MeshcopTLVItem,
     MeshcopTLVType,
     NetworkName,
     TLVError,
+    TLVStreamDecoder,
     encode_tlv,
+    encode_tlv_bytes,
     parse_tlv,
+    parse_tlv_bytes,
+    parse_tlv_many,
+    register_decoder,
+    tlv_content_hash,
 )
 
 # Shared dataset covering the newly added Meshcop TLV types.
 NEW_MESHCOP_DATASET: dict[MeshcopTLVType | int, MeshcopTLVItem] = {
-    MeshcopTLVType.DURATION: MeshcopTLVItem(
-        MeshcopTLVType.DURATION, bytes.fromhex("05")
-    ),
-    MeshcopTLVType.PROVISIONING_URL: MeshcopTLVItem(
+    MeshcopTLVType.DURATION: Integer(MeshcopTLVType.DURATION, bytes.fromhex("05")),
+    MeshcopTLVType.PROVISIONING_URL: Text(
         MeshcopTLVType.PROVISIONING_URL, "test".encode()
     ),
-    MeshcopTLVType.VENDOR_NAME_TLV: MeshcopTLVItem(
+    MeshcopTLVType.VENDOR_NAME_TLV: Text(
         MeshcopTLVType.VENDOR_NAME_TLV, "ACME".encode()
     ),
     MeshcopTLVType.UDP_ENCAPSULATION_TLV: MeshcopTLVItem(
         MeshcopTLVType.UDP_ENCAPSULATION_TLV, bytes.fromhex("beef")
     ),
-    MeshcopTLVType.IPV6_ADDRESS_TLV: MeshcopTLVItem(
+    MeshcopTLVType.IPV6_ADDRESS_TLV: IPv6Address(
         MeshcopTLVType.IPV6_ADDRESS_TLV,
         bytes.fromhex("20010db8000000000000000000000001"),
     ),
-    MeshcopTLVType.PENDINGTIMESTAMP: MeshcopTLVItem(
+    MeshcopTLVType.PENDINGTIMESTAMP: Timestamp(
         MeshcopTLVType.PENDINGTIMESTAMP, bytes.fromhex("0000000000010000")
     ),
-    MeshcopTLVType.DELAYTIMER: MeshcopTLVItem(
+    MeshcopTLVType.DELAYTIMER: Integer(
         MeshcopTLVType.DELAYTIMER, bytes.fromhex("00001388")
     ),
-    MeshcopTLVType.COUNT: MeshcopTLVItem(MeshcopTLVType.COUNT, bytes.fromhex("03")),
-    MeshcopTLVType.PERIOD: MeshcopTLVItem(MeshcopTLVType.PERIOD, bytes.fromhex("0032")),
-    MeshcopTLVType.SCAN_DURATION: MeshcopTLVItem(
+    MeshcopTLVType.COUNT: Integer(MeshcopTLVType.COUNT, bytes.fromhex("03")),
+    MeshcopTLVType.PERIOD: Integer(MeshcopTLVType.PERIOD, bytes.fromhex("0032")),
+    MeshcopTLVType.SCAN_DURATION: Integer(
         MeshcopTLVType.SCAN_DURATION, bytes.fromhex("04")
     ),
     MeshcopTLVType.ENERGY_LIST: MeshcopTLVItem(
         MeshcopTLVType.ENERGY_LIST, bytes.fromhex("010203")
     ),
-    MeshcopTLVType.THREAD_DOMAIN_NAME: MeshcopTLVItem(
+    MeshcopTLVType.THREAD_DOMAIN_NAME: Text(
         MeshcopTLVType.THREAD_DOMAIN_NAME, "home".encode()
     ),
     MeshcopTLVType.DISCOVERYREQUEST: MeshcopTLVItem(
@@ -66,6 +81,13 @@ NEW_MESHCOP_DATASET_HEX = (
     "800100810101f10102"
 )
 
+# Active dataset used by the parsing tests
+DATASET_HEX = (
+    "0E080000000000010000000300000F35060004001FFFE0020811111111222222220708FDAD70BF"
+    "E5AA15DD051000112233445566778899AABBCCDDEEFF030E4F70656E54687265616444656D6F01"
+    "0212340410445F2B5CA6F2A93A55CE570A70EFEECB0C0402A0F7F8"
+)
+
 
 def test_encode_tlv() -> None:
     """Test the TLV parser."""
@@ -103,34 +125,37 @@ def test_encode_tlv() -> None:
         189: MeshcopTLVItem(189, bytes.fromhex("abcdef")),
     }
     dataset_tlv = encode_tlv(dataset)
-    assert (
-        dataset_tlv
-        == (
-            "0E080000000000010000000300000F35060004001FFFE0020811111111222222220708FDAD"
-            "70BFE5AA15DD051000112233445566778899AABBCCDDEEFF030E4F70656E54687265616444"
-            "656D6F010212340410445F2B5CA6F2A93A55CE570A70EFEECB0C0402A0F7F8BD03ABCDEF"
-        ).lower()
-    )
+    assert dataset_tlv == (DATASET_HEX + "BD03ABCDEF").lower()
 
     encoded_new_types = encode_tlv(NEW_MESHCOP_DATASET)
     assert encoded_new_types == NEW_MESHCOP_DATASET_HEX
 
 
+def test_encode_tlv_bytes() -> None:
+    """Test encoding a TLV dataset to bytes."""
+    assert encode_tlv_bytes({}) == b""
+    assert encode_tlv_bytes(NEW_MESHCOP_DATASET) == bytes.fromhex(
+        NEW_MESHCOP_DATASET_HEX
+    )
+
+    assert encode_tlv_bytes({189: MeshcopTLVItem(189, bytes(254))}) == (
+        b"\xbd\xfe" + bytes(254)
+    )
+    with pytest.raises(TLVError, match="value of tag 189 too long: 255 bytes"):
+        encode_tlv_bytes({189: MeshcopTLVItem(189, bytes(255))})
+    with pytest.raises(TLVError, match="value of tag 189 too long: 256 bytes"):
+        encode_tlv_bytes({189: MeshcopTLVItem(189, bytes(256))})
+
+
 def test_parse_tlv() -> None:
     """Test the TLV parser."""
-    dataset_tlv = (
-        "0E080000000000010000000300000F35060004001FFFE0020811111111222222220708FDAD70BF"
-        "E5AA15DD051000112233445566778899AABBCCDDEEFF030E4F70656E54687265616444656D6F01"
-        "0212340410445F2B5CA6F2A93A55CE570A70EFEECB0C0402A0F7F8BD03ABCDEF"
-    )
+    dataset_tlv = DATASET_HEX + "BD03ABCDEF"
     dataset = parse_tlv(dataset_tlv)
     assert dataset == {
         MeshcopTLVType.CHANNEL: Channel(
             MeshcopTLVType.CHANNEL, bytes.fromhex("00000f")
         ),
-        MeshcopTLVType.PANID: MeshcopTLVItem(
-            MeshcopTLVType.PANID, bytes.fromhex("1234")
-        ),
+        MeshcopTLVType.PANID: Integer(MeshcopTLVType.PANID, bytes.fromhex("1234")),
         MeshcopTLVType.EXTPANID: MeshcopTLVItem(
             MeshcopTLVType.EXTPANID, bytes.fromhex("1111111122222222")
         ),
@@ -143,16 +168,16 @@ def test_parse_tlv() -> None:
         MeshcopTLVType.NETWORKKEY: MeshcopTLVItem(
             MeshcopTLVType.NETWORKKEY, bytes.fromhex("00112233445566778899aabbccddeeff")
         ),
-        MeshcopTLVType.MESHLOCALPREFIX: MeshcopTLVItem(
+        MeshcopTLVType.MESHLOCALPREFIX: MeshLocalPrefix(
             MeshcopTLVType.MESHLOCALPREFIX, bytes.fromhex("fdad70bfe5aa15dd")
         ),
-        MeshcopTLVType.SECURITYPOLICY: MeshcopTLVItem(
+        MeshcopTLVType.SECURITYPOLICY: SecurityPolicy(
             MeshcopTLVType.SECURITYPOLICY, bytes.fromhex("02a0f7f8")
         ),
         MeshcopTLVType.ACTIVETIMESTAMP: Timestamp(
             MeshcopTLVType.ACTIVETIMESTAMP, bytes.fromhex("0000000000010000")
         ),
-        MeshcopTLVType.CHANNELMASK: MeshcopTLVItem(
+        MeshcopTLVType.CHANNELMASK: ChannelMask(
             MeshcopTLVType.CHANNELMASK, bytes.fromhex("0004001fffe0")
         ),
         189: MeshcopTLVItem(189, bytes.fromhex("abcdef")),
@@ -162,6 +187,228 @@ def test_parse_tlv() -> None:
     assert parsed_new_types == NEW_MESHCOP_DATASET
 
 
+def test_parse_tlv_trusted(caplog: pytest.LogCaptureFixture) -> None:
+    """Test the trusted mode skips the checks for malformed datasets."""
+    dataset_tlv = NEW_MESHCOP_DATASET_HEX + "BD03ABCDEF"
+    assert parse_tlv(dataset_tlv, trusted=True) == parse_tlv(dataset_tlv)
+    caplog.clear()
+
+    assert parse_tlv("BD03ABCDEF", trusted=True) == {
+        189: MeshcopTLVItem(189, bytes.fromhex("abcdef"))
+    }
+    # The last duplicated tag wins
+    assert parse_tlv_bytes(bytes.fromhex("000300000f0003000019"), trusted=True) == {
+        MeshcopTLVType.CHANNEL: Channel(MeshcopTLVType.CHANNEL, bytes.fromhex("000019"))
+    }
+    assert "unknown TLV type" not in caplog.text
+
+    for tlv in ("FF", "FF01", "030E4F70656E54687265616444656D"):
+        with pytest.raises(TLVError, match="truncated tlv"):
+            parse_tlv(tlv, trusted=True)
+    with pytest.raises(TLVError, match="invalid network name"):
+        parse_tlv("030E4F70656E54687265616444656DFF", trusted=True)
+
+
+@pytest.mark.parametrize("wrap", (bytes, bytearray, memoryview))
+def test_parse_tlv_bytes(wrap) -> None:
+    """Test the TLV parser accepts raw bytes."""
+    dataset_tlv = DATASET_HEX + "BD03ABCDEF"
+    dataset = parse_tlv_bytes(wrap(bytes.fromhex(dataset_tlv)))
+    assert dataset == parse_tlv(dataset_tlv)
+    assert all(isinstance(item.data, bytes) for item in dataset.values())
+
+
+def test_tlv_content_hash(caplog: pytest.LogCaptureFixture) -> None:
+    """Test hashing TLV encoded datasets."""
+    dataset_tlv = bytes.fromhex(DATASET_HEX)
+    items = parse_tlv_bytes(dataset_tlv)
+    reordered = encode_tlv_bytes(dict(reversed(items.items())))
+    assert reordered != dataset_tlv
+
+    content_hash = tlv_content_hash(dataset_tlv)
+    assert content_hash.hex() == "cafb9f29f31310212d4fc95ccd9872f6"
+    assert tlv_content_hash(reordered) == content_hash
+    assert tlv_content_hash(memoryview(reordered)) == content_hash
+
+    items[MeshcopTLVType.CHANNEL] = Channel(MeshcopTLVType.CHANNEL, b"\x00\x00\x10")
+    assert tlv_content_hash(encode_tlv_bytes(items)) != content_hash
+
+    with pytest.raises(TLVError, match="duplicated tag"):
+        tlv_content_hash(bytes.fromhex("0003000010000300000f"))
+
+    # Unknown tags are hashed, but not logged
+    caplog.clear()
+    assert tlv_content_hash(bytes.fromhex(DATASET_HEX + "BD03ABCDEF")) != content_hash
+    assert "unknown TLV type" not in caplog.text
+
+
+def test_lazy_dataset() -> None:
+    """Test items of a lazy dataset are decoded on access."""
+    dataset_tlv = DATASET_HEX + "BD03ABCDEF"
+    dataset = LazyDataset.from_hex(dataset_tlv)
+    assert len(dataset) == 11
+    assert list(dataset) == list(parse_tlv(dataset_tlv))
+    assert dataset == parse_tlv(dataset_tlv)
+    assert dataset[MeshcopTLVType.CHANNEL] is dataset[MeshcopTLVType.CHANNEL]
+    assert MeshcopTLVType.PENDINGTIMESTAMP not in dataset
+
+    # The invalid network name is only detected when it is accessed
+    dataset = LazyDataset(bytes.fromhex("000300000f030E4F70656E54687265616444656DFF"))
+    with patch("python_otbr_api.tlv_parser._parse_item") as parse_item:
+        assert MeshcopTLVType.NETWORKNAME in dataset
+        assert MeshcopTLVType.PANID not in dataset
+    parse_item.assert_not_called()
+    channel = dataset[MeshcopTLVType.CHANNEL]
+    assert isinstance(channel, Channel)
+    assert channel.channel == 15
+    with pytest.raises(TLVError, match="invalid network name"):
+        dataset[MeshcopTLVType.NETWORKNAME]  # pylint: disable=pointless-statement
+
+
+@pytest.mark.parametrize(
+    "tlv, msg",
+    (
+        ("killevippen", "invalid tlvs"),
+        ("FF", "truncated tlv header"),
+        ("000101000101", "duplicated tag <MeshcopTLVType.CHANNEL: 0>"),
+    ),
+)
+def test_lazy_dataset_error(tlv, msg) -> None:
+    """Test the lazy dataset validates the TLV framing up front."""
+    with pytest.raises(TLVError, match=msg):
+        LazyDataset.from_hex(tlv)
+
+
+@pytest.mark.parametrize("chunk_size", (1, 256))
+def test_parse_tlv_many(chunk_size) -> None:
+    """Test parsing a batch of datasets, with and without an executor."""
+    datasets: list[str | bytes | memoryview] = [
+        NEW_MESHCOP_DATASET_HEX,
+        "FF",
+        bytes.fromhex(NEW_MESHCOP_DATASET_HEX),
+        "0e0100",
+        bytes.fromhex("330100"),
+        memoryview(bytes.fromhex("000300000f")),
+    ]
+    expected = [
+        NEW_MESHCOP_DATASET,
+        "truncated tlv header",
+        NEW_MESHCOP_DATASET,
+        "invalid timestamp '00'",
+        "invalid timestamp '00'",
+        {MeshcopTLVType.CHANNEL: Channel(MeshcopTLVType.CHANNEL, b"\x00\x00\x0f")},
+    ]
+
+    results = parse_tlv_many(datasets)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        results_executor = parse_tlv_many(
+            datasets, executor=executor, chunk_size=chunk_size
+        )
+
+    for result in (results, results_executor):
+        assert len(result) == len(expected)
+        for parsed, expected_result in zip(result, expected):
+            if isinstance(expected_result, str):
+                assert isinstance(parsed, TLVError)
+                assert str(parsed) == expected_result
+            else:
+                assert parsed == expected_result
+
+
+def test_register_decoder() -> None:
+    """Test registering a decoder for an unknown tag."""
+
+    class VendorItem(MeshcopTLVItem):  # pylint: disable=too-few-public-methods
+        """Vendor specific item."""
+
+    register_decoder(189, VendorItem)
+    try:
+        dataset = parse_tlv("BD03ABCDEF")
+    finally:
+        register_decoder(189, MeshcopTLVItem)
+    assert dataset == {189: VendorItem(189, bytes.fromhex("abcdef"))}
+    assert parse_tlv("BD03ABCDEF") == {
+        189: MeshcopTLVItem(189, bytes.fromhex("abcdef"))
+    }
+
+    with pytest.raises(ValueError, match="invalid tag 256"):
+        register_decoder(256, VendorItem)
+
+
+@pytest.mark.parametrize("chunk_size", (1, 2, 7, 1000))
+def test_stream_decoder(chunk_size) -> None:
+    """Test decoding a TLV dataset which arrives in chunks."""
+    data = bytes.fromhex(NEW_MESHCOP_DATASET_HEX)
+    decoder = TLVStreamDecoder()
+    items = []
+    for pos in range(0, len(data), chunk_size):
+        items.extend(decoder.feed(data[pos : pos + chunk_size]))
+    decoder.close()
+    assert items == list(NEW_MESHCOP_DATASET.values())
+
+
+@pytest.mark.parametrize(
+    "tlv, msg",
+    (
+        ("FF", "truncated tlv header"),
+        ("FF01", "expected 1 bytes for tag 255, got 0"),
+        (
+            "030E4F70656E54687265616444656D",
+            "expected 14 bytes for tag <MeshcopTLVType.NETWORKNAME: 3>, got 13",
+        ),
+        ("80FF01", "truncated tlv header"),
+        (
+            "80FF0100AB",
+            "expected 256 bytes for tag <MeshcopTLVType.DISCOVERYREQUEST: 128>, got 1",
+        ),
+    ),
+)
+def test_stream_decoder_truncated(tlv, msg) -> None:
+    """Test truncation is reported at the end of the input."""
+    decoder = TLVStreamDecoder()
+    assert not decoder.feed(bytes.fromhex(tlv))
+    with pytest.raises(TLVError, match=msg):
+        decoder.close()
+
+
+def test_stream_decoder_invalid_item() -> None:
+    """Test an invalid item is reported as soon as it is complete."""
+    decoder = TLVStreamDecoder()
+    assert not decoder.feed(bytes.fromhex("030E4F70656E54687265616444656D"))
+    with pytest.raises(TLVError, match="invalid network name"):
+        decoder.feed(b"\xff")
+
+
+def test_stream_decoder_continues_after_invalid_item() -> None:
+    """Test the invalid item is dropped and the other items are kept."""
+    channel = Channel(MeshcopTLVType.CHANNEL, bytes.fromhex("00000f"))
+    pan_id = Integer(MeshcopTLVType.PANID, bytes.fromhex("1234"))
+    decoder = TLVStreamDecoder()
+    with pytest.raises(TLVError, match="invalid network name"):
+        decoder.feed(bytes.fromhex("000300000f0301ff01021234"))
+    assert decoder.feed(b"") == [channel, pan_id]
+    assert decoder.feed(bytes.fromhex("000300000f")) == [channel]
+
+    with pytest.raises(TLVError, match="invalid network name"):
+        decoder.feed(bytes.fromhex("000300000f0301ff"))
+    assert decoder.close() == [channel]
+
+
+def test_stream_decoder_extended_tlv() -> None:
+    """Test decoding extended TLVs, with a 16 bit length."""
+    value = bytes(range(256)) * 2
+    data = bytes.fromhex("80FF0200") + value + bytes.fromhex("000300000f")
+    decoder = TLVStreamDecoder()
+    items = []
+    for pos in range(0, len(data), 100):
+        items.extend(decoder.feed(data[pos : pos + 100]))
+    assert not decoder.close()
+    assert items == [
+        MeshcopTLVItem(MeshcopTLVType.DISCOVERYREQUEST, value),
+        Channel(MeshcopTLVType.CHANNEL, bytes.fromhex("00000f")),
+    ]
+
+
 def test_parse_tlv_with_wakeup_channel() -> None:
     """Test the TLV parser from a (truncated) dataset from an Apple BR."""
     dataset_tlv = (
@@ -176,10 +423,10 @@ def test_parse_tlv_with_wakeup_channel() -> None:
         MeshcopTLVType.CHANNEL: Channel(
             MeshcopTLVType.CHANNEL, bytes.fromhex("000019")
         ),
-        MeshcopTLVType.WAKEUP_CHANNEL: MeshcopTLVItem(
+        MeshcopTLVType.WAKEUP_CHANNEL: Channel(
             MeshcopTLVType.WAKEUP_CHANNEL, bytes.fromhex("00000f")
         ),
-        MeshcopTLVType.CHANNELMASK: MeshcopTLVItem(
+        MeshcopTLVType.CHANNELMASK: ChannelMask(
             MeshcopTLVType.CHANNELMASK, bytes.fromhex("0004001fffc0")
         ),
         MeshcopTLVType.NETWORKNAME: NetworkName(
@@ -188,6 +435,52 @@ def test_parse_tlv_with_wakeup_channel() -> None:
     }
 
 
+def test_parse_tlv_typed_items() -> None:
+    """Test the decoded values of the typed items."""
+    dataset = parse_tlv(DATASET_HEX + "3308000000000002000134040000138810013F")
+    pan_id = dataset[MeshcopTLVType.PANID]
+    assert isinstance(pan_id, Integer)
+    assert pan_id.value == 0x1234
+    mesh_local_prefix = dataset[MeshcopTLVType.MESHLOCALPREFIX]
+    assert isinstance(mesh_local_prefix, MeshLocalPrefix)
+    assert str(mesh_local_prefix.prefix) == "fdad:70bf:e5aa:15dd::/64"
+    channel_mask = dataset[MeshcopTLVType.CHANNELMASK]
+    assert isinstance(channel_mask, ChannelMask)
+    assert channel_mask.masks == {0: 0x07FFF800}
+    pending_timestamp = dataset[MeshcopTLVType.PENDINGTIMESTAMP]
+    assert isinstance(pending_timestamp, Timestamp)
+    assert pending_timestamp.seconds == 2
+    assert pending_timestamp.authoritative is True
+    delay_timer = dataset[MeshcopTLVType.DELAYTIMER]
+    assert isinstance(delay_timer, Integer)
+    assert delay_timer.value == 5000
+    state = dataset[MeshcopTLVType.STATE]
+    assert isinstance(state, State)
+    assert state.value == 63
+
+    security_policy = dataset[MeshcopTLVType.SECURITYPOLICY]
+    assert isinstance(security_policy, SecurityPolicy)
+    assert security_policy.rotation_time == 672
+    assert security_policy.obtain_network_key is True
+    assert security_policy.native_commissioning is True
+    assert security_policy.routers is True
+    assert security_policy.external_commissioning is True
+    assert security_policy.commercial_commissioning is False
+    assert security_policy.autonomous_enrollment is False
+    assert security_policy.network_key_provisioning is False
+    assert security_policy.to_ble_link is True
+    assert security_policy.non_ccm_routers is False
+    assert security_policy.version_threshold_for_routing == 0
+
+    assert parse_tlv("1001FF")[MeshcopTLVType.STATE] == State(
+        MeshcopTLVType.STATE, b"\xff"
+    )
+    assert str(parse_tlv("200474657374")[MeshcopTLVType.PROVISIONING_URL]) == "test"
+    address = parse_tlv(NEW_MESHCOP_DATASET_HEX)[MeshcopTLVType.IPV6_ADDRESS_TLV]
+    assert isinstance(address, IPv6Address)
+    assert str(address.address) == "2001:db8::1"
+
+
 @pytest.mark.parametrize(
     "tlv, error, msg",
     (
@@ -216,6 +509,13 @@ def test_parse_tlv_with_wakeup_channel() -> None:
             TLVError,
             "invalid network name '4f70656e54687265616444656dff'",
         ),
+        ("0C0202A0", TLVError, "invalid security policy '02a0'"),
+        ("350400040000", TLVError, "invalid channel mask '00040000'"),
+        ("0704FDAD70BF", TLVError, "invalid mesh local prefix 'fdad70bf'"),
+        ("3101FF", TLVError, "invalid ipv6 address 'ff'"),
+        ("2001FF", TLVError, "invalid text 'ff'"),
+        ("0E0100", TLVError, "invalid timestamp '00'"),
+        ("330100", TLVError, "invalid timestamp '00'"),
     ),
 )
 def test_parse_tlv_error(tlv, error, msg) -> None:
@@ -224,6 +524,14 @@ def test_parse_tlv_error(tlv, error, msg) -> None:
         parse_tlv(tlv)
 
 
+def test_items_are_slotted() -> None:
+    """Test the built-in items don't carry a per-instance __dict__."""
+    dataset = parse_tlv(DATASET_HEX + NEW_MESHCOP_DATASET_HEX + "1001FF")
+    assert len({type(item) for item in dataset.values()}) == 11
+    for item in dataset.values():
+        assert not hasattr(item, "__dict__"), type(item)
+
+
 def test_timestamp_parsing_full_integrity() -> None:
     """
     Test parsing of a timestamp with mixed values for seconds, ticks, and authoritative.
@@ -261,6 +261,14 @@ class AiohttpClientMockResponse:
     def release(self):
         """Mock release."""
 
+    async def __aenter__(self):
+        """Enter the response context."""
+        return self
+
+    async def __aexit__(self, *exc_info):
+        """Exit the response context, releasing the response."""
+        self.release()
+
     def raise_for_status(self):
         """Raise error if status is 400 or higher."""
         if self.status >= 400:
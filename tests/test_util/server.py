@@ -0,0 +1,88 @@
+"""Local stand-in for the OTBR REST API."""
+
+import asyncio
+from collections import Counter
+from collections.abc import Awaitable, Callable
+from http import HTTPStatus
+from typing import Any
+
+from aiohttp import web
+
+BORDER_AGENT_ID = "230C6A1AC57F6F4BE262ACF32E5EF52C"
+
+
+class OTBRServer:
+    """Minimal OTBR REST API served on localhost.
+
+    Tracks the client connections it has seen, so tests can check connections
+    are reused, and counts the requests to each path.
+    """
+
+    def __init__(self) -> None:
+        """Initialize."""
+        self.peers: set[Any] = set()
+        self.requests = 0
+        self.paths: Counter[str] = Counter()
+        self.url = ""
+        self.app = web.Application(middlewares=[self._track_peer])
+        self.app.router.add_get("/api/actions", self._actions)
+        self.app.router.add_get("/node/ba-id", self._border_agent_id)
+        self.app.router.add_delete("/node", self._factory_reset)
+        self.app.router.add_get("/node/dataset/active", self._active_dataset)
+        self._runner = web.AppRunner(self.app, access_log=None)
+
+    async def start(self) -> None:
+        """Start serving on a free port."""
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        host, port = self._runner.addresses[0][:2]
+        self.url = f"http://{host}:{port}"
+
+    async def stop(self) -> None:
+        """Stop serving."""
+        await self._runner.cleanup()
+
+    @web.middleware
+    async def _track_peer(
+        self,
+        request: web.Request,
+        handler: Callable[[web.Request], Awaitable[web.StreamResponse]],
+    ) -> web.StreamResponse:
+        """Record the client connection of a request."""
+        self.requests += 1
+        self.paths[request.path] += 1
+        assert request.transport is not None
+        self.peers.add(request.transport.get_extra_info("peername"))
+        return await handler(request)
+
+    async def _actions(self, _request: web.Request) -> web.Response:
+        """Answer the key format probe."""
+        return web.json_response({"data": []})
+
+    async def _border_agent_id(self, _request: web.Request) -> web.Response:
+        """Return the border agent ID."""
+        return web.json_response(BORDER_AGENT_ID)
+
+    async def _factory_reset(self, request: web.Request) -> web.StreamResponse:
+        """Refuse to factory reset, with a body the client doesn't use."""
+        return await _slow_error(request, HTTPStatus.METHOD_NOT_ALLOWED)
+
+    async def _active_dataset(self, request: web.Request) -> web.StreamResponse:
+        """Fail to return the active dataset, with a body the client doesn't use."""
+        return await _slow_error(request, HTTPStatus.INTERNAL_SERVER_ERROR)
+
+
+async def _slow_error(request: web.Request, status: HTTPStatus) -> web.StreamResponse:
+    """Send an error with a body that arrives in parts after the headers.
+
+    The connection stays busy until the client has read the whole body, so a
+    client which doesn't read it can't reuse the connection right away.
+    """
+    response = web.StreamResponse(status=status)
+    await response.prepare(request)
+    for _ in range(2):
+        await response.write(f"{status.phrase}\n".encode())
+        await asyncio.sleep(0)
+    await response.write_eof()
+    return response